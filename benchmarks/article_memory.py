@@ -0,0 +1,57 @@
+# article_memory.py - Memory benchmark of loaded articles.
+# Author: Franck Michea < franck.michea@gmail.com >
+# License: New BSD License (See LICENSE)
+
+'''
+Measures with tracemalloc the memory held by the articles manager once a
+synthetic blog is loaded, with full articles and in compact mode. Run it from
+the root of the repository with:
+
+    python -m benchmarks.article_memory [--articles N]
+'''
+
+import argparse
+import gc
+import os
+import shutil
+import tempfile
+import tracemalloc
+
+from benchmarks.synthetic import make_blog
+from lpbm.modules.articles import Articles
+
+
+def _measure(root, compact):
+    gc.collect()
+    tracemalloc.start()
+    articles = Articles()
+    articles.module_load({}, argparse.Namespace(exec_path=root, jobs=1, compact=compact))
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(articles.all_objects), current, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-a', '--articles', type=int, default=5000,
+                        help='number of articles in the blog. (default: %(default)s)')
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='lpbm-bench-')
+    try:
+        make_blog(os.path.join(root, 'blog'), args.articles)
+        print('{:>8} {:>10} {:>14} {:>14} {:>12}'.format(
+            'mode', 'articles', 'current (KB)', 'peak (KB)', 'per article'))
+        for compact in [False, True]:
+            count, current, peak = _measure(os.path.join(root, 'blog'), compact)
+            print('{:>8} {:>10} {:>14.0f} {:>14.0f} {:>10.0f} B'.format(
+                'compact' if compact else 'full', count, current / 1024, peak / 1024,
+                current / count,
+            ))
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
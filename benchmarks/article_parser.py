@@ -0,0 +1,85 @@
+# article_parser.py - Micro-benchmark of articles' markdown parsing.
+# Author: Franck Michea < franck.michea@gmail.com >
+# License: New BSD License (See LICENSE)
+
+'''
+Compares the bulk parser of articles' markdown files with the previous
+implementation, reading line by line and concatenating strings. Run it from
+the root of the repository with:
+
+    python -m benchmarks.article_parser [--repeat N]
+'''
+
+import argparse
+import codecs
+import os
+import shutil
+import tempfile
+import timeit
+
+from lpbm.models.articles import Article
+
+_SIZES = [10 * 1024, 100 * 1024, 500 * 1024, 2 * 1024 * 1024]
+_CODE_LINE = '    for (int i = 0; i < size; ++i) { buffer[i] = compute(i); }\n'
+
+
+def _legacy_read(filename):
+    '''Previous implementation of the parsing in Article.__init__.'''
+    title, content = '', ''
+    f = codecs.open(filename, 'r', 'utf-8')
+    line = f.readline()
+    while line:
+        if line.startswith('=='):
+            line = f.readline()
+            break
+        title += line[:-1]
+        line = f.readline()
+    while line:
+        content += line
+        line = f.readline()
+    f.close()
+    return title, content
+
+
+def _bulk_read(filename):
+    article = Article.__new__(Article)
+    article._read_markdown(filename, False)
+    return article.title, article.content
+
+
+def _write_article(root, size):
+    filename = os.path.join(root, 'article-{}.markdown'.format(size))
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write('Some Big Post Full Of Code\n==========================\n\n')
+        f.write('Some text before the code.\n\n    :::c\n')
+        f.write(_CODE_LINE * (size // len(_CODE_LINE)))
+        f.write('\nSome text after the code.\n')
+    return filename
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+                        help='number of runs per file. (default: %(default)s)')
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='lpbm-bench-')
+    try:
+        print('{:>10} {:>12} {:>12} {:>8}'.format('size', 'legacy (ms)', 'bulk (ms)', 'speedup'))
+        for size in _SIZES:
+            filename = _write_article(root, size)
+            assert _legacy_read(filename) == _bulk_read(filename)
+
+            results = []
+            for fn in [_legacy_read, _bulk_read]:
+                timer = timeit.Timer(lambda: fn(filename))
+                results.append(min(timer.repeat(repeat=args.repeat, number=1)) * 1000)
+            print('{:>10} {:>12.2f} {:>12.2f} {:>7.1f}x'.format(
+                size, results[0], results[1], results[0] / results[1]
+            ))
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
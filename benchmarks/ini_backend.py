@@ -0,0 +1,77 @@
+# ini_backend.py - Benchmark of configuration backends.
+# Author: Franck Michea < franck.michea@gmail.com >
+# License: New BSD License (See LICENSE)
+
+'''
+Compares configparser and the fast ini backend on articles' configuration
+files of a synthetic blog: time to build a ConfigModel and memory held by each
+instance. Run it from the root of the repository with:
+
+    python -m benchmarks.ini_backend [--articles N]
+'''
+
+import argparse
+import gc
+import glob
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.synthetic import make_blog
+from lpbm.models.configmodel import ConfigModel
+
+
+def _build(filenames, backend):
+    return [ConfigModel(filename, backend=backend) for filename in filenames]
+
+
+def _measure_time(filenames, backend, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _build(filenames, backend)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def _measure_memory(filenames, backend):
+    gc.collect()
+    tracemalloc.start()
+    models = _build(filenames, backend)
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(models) == len(filenames)
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-a', '--articles', type=int, default=5000,
+                        help='number of articles in the blog. (default: %(default)s)')
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help='number of runs per backend. (default: %(default)s)')
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='lpbm-bench-')
+    try:
+        make_blog(os.path.join(root, 'blog'), args.articles, paragraphs=1)
+        filenames = sorted(glob.glob(os.path.join(root, 'blog', 'articles', '*.cfg')))
+
+        print('{:>14} {:>10} {:>16} {:>16}'.format(
+            'backend', 'files', 'per file (us)', 'per instance'))
+        for backend in ['configparser', 'fast']:
+            seconds = _measure_time(filenames, backend, args.repeat)
+            memory = _measure_memory(filenames, backend)
+            print('{:>14} {:>10} {:>16.1f} {:>14.0f} B'.format(
+                backend, len(filenames), seconds * 1e6 / len(filenames),
+                memory / len(filenames),
+            ))
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# model_fields.py - Benchmark of model fields access.
+# Author: Franck Michea < franck.michea@gmail.com >
+# License: New BSD License (See LICENSE)
+
+'''
+Measures the cost of reading fields of articles, authors and categories of a
+synthetic blog, compared to reading a plain attribute of the same objects.
+Value fields (title) are read about as fast as a plain attribute, option fields
+are a few times slower. Run it from the root of the repository with:
+
+    python -m benchmarks.model_fields [--number N]
+'''
+
+import argparse
+import os
+import shutil
+import tempfile
+import timeit
+
+from benchmarks.synthetic import make_blog
+from lpbm.modules.articles import Articles
+from lpbm.modules.authors import Authors
+from lpbm.modules.categories import Categories
+
+_FIELDS = {
+    'articles': ['id', 'title', 'published', 'deleted'],
+    'authors': ['id', 'email', 'first_name', 'deleted'],
+    'categories': ['id', 'slug', 'parent', 'deleted'],
+}
+
+
+def _load(root):
+    args = argparse.Namespace(exec_path=root, jobs=1, compact=False)
+    modules = dict((mod.name(), mod) for mod in [Authors(), Categories(), Articles()])
+    for mod in modules.values():
+        mod.module_load(modules, args)
+    return modules
+
+
+def _measure(stmt, obj, number, repeat):
+    timer = timeit.Timer(stmt, globals={'obj': obj})
+    return min(timer.repeat(repeat=repeat, number=number)) * 1e9 / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-n', '--number', type=int, default=200000,
+                        help='number of accesses per measure. (default: %(default)s)')
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+                        help='number of measures per field. (default: %(default)s)')
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='lpbm-bench-')
+    try:
+        make_blog(os.path.join(root, 'blog'), 10, paragraphs=1)
+        modules = _load(os.path.join(root, 'blog'))
+
+        print('{:>12} {:>12} {:>14} {:>10}'.format('model', 'field', 'access (ns)', 'vs plain'))
+        for name, fields in sorted(_FIELDS.items()):
+            obj = modules[name].objects[0]
+            plain = _measure('obj.mod', obj, args.number, args.repeat)
+            for field in ['mod'] + fields:
+                ns = _measure('obj.' + field, obj, args.number, args.repeat)
+                print('{:>12} {:>12} {:>14.1f} {:>9.1f}x'.format(
+                    type(obj).__name__, field, ns, ns / plain))
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+# startup.py - Startup time benchmark with budgets.
+# Author: Franck Michea < franck.michea@gmail.com >
+# License: New BSD License (See LICENSE)
+
+'''
+Measures how long lpbm takes to reach a command, as wall time of the whole
+process and total time spent importing modules (python -X importtime), on the
+test blog and on synthetic blogs. Measures are divided by the ones of a bare
+interpreter (python -c pass) on the same machine, and these ratios are compared
+to the baselines of benchmarks/startup_budgets.json: the benchmark fails if
+one of them is exceeded by more than the threshold. Run it from the root of the
+repository with:
+
+    python -m benchmarks.startup [--update]
+
+It is also run by the test suite when LPBM_BENCHMARKS is set in environment.
+'''
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import make_blog
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_BUDGETS = os.path.join(_ROOT, 'benchmarks', 'startup_budgets.json')
+_MAIN = 'import sys; from lpbm.main import main; main(sys.argv[1:])'
+
+_COMMANDS = {
+    'help': ['--help'],
+    'config': ['config', '-l'],
+    'authors': ['authors', '-l'],
+    'articles': ['articles', '-l'],
+}
+_SYNTHETIC_BLOGS = [1000, 5000]
+
+
+def _run(args, importtime=False):
+    prefix = [sys.executable] + (['-X', 'importtime'] if importtime else [])
+    return subprocess.run(prefix + args, cwd=_ROOT, stdout=subprocess.DEVNULL,
+                          stderr=subprocess.PIPE, universal_newlines=True)
+
+
+def _command_args(blog, command):
+    return ['-c', _MAIN, '--exec-path', blog] + _COMMANDS[command]
+
+
+def _wall_time(args, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        _run(args)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def _import_time(args, runs):
+    '''Returns the sum of self import times of all modules, in ms.'''
+    timings = []
+    for _ in range(runs):
+        total = 0
+        for line in _run(args, importtime=True).stderr.splitlines():
+            if not line.startswith('import time:'):
+                continue
+            try:
+                total += int(line.split(':', 1)[1].split('|')[0])
+            except ValueError:
+                continue  # Header line.
+        timings.append(total / 1000)
+    return statistics.median(timings)
+
+
+def _format_limit(limit):
+    return '-' if limit is None else '{:.2f}'.format(limit)
+
+
+def load_budgets():
+    try:
+        with open(_BUDGETS) as f:
+            return json.load(f)
+    except IOError:
+        return {'threshold': 0.25, 'baselines': {}}
+
+
+def measure(runs, out=sys.stdout):
+    '''
+    Returns ratios of the measures of each blog and command to the ones of a
+    bare interpreter, by blog/command.
+    '''
+    reference = {
+        'wall_ms': _wall_time(['-c', 'pass'], runs),
+        'import_ms': _import_time(['-c', 'pass'], runs),
+    }
+    print('Reference (python -c pass): {wall_ms:.1f} ms wall, {import_ms:.1f} ms '
+          'importing.'.format(**reference), file=out)
+
+    root = tempfile.mkdtemp(prefix='lpbm-bench-')
+    try:
+        blogs = [('test-blog-1', os.path.join(_ROOT, 'tests', 'data', 'test-blog-1'))]
+        for nb_articles in _SYNTHETIC_BLOGS:
+            name = 'synthetic-{}'.format(nb_articles)
+            make_blog(os.path.join(root, name), nb_articles, paragraphs=1)
+            blogs.append((name, os.path.join(root, name)))
+
+        ratios = dict()
+        for blog_name, blog in blogs:
+            for command in _COMMANDS:
+                args = _command_args(blog, command)
+                ratios['{}/{}'.format(blog_name, command)] = {
+                    'wall_ratio': round(_wall_time(args, runs) / reference['wall_ms'], 2),
+                    'import_ratio': round(_import_time(args, runs) / reference['import_ms'], 2),
+                }
+    finally:
+        shutil.rmtree(root)
+    return ratios
+
+
+def check(budgets, ratios, threshold=None, out=sys.stdout):
+    '''Returns the list of budgets exceeded by ratios, printing them all.'''
+    threshold = budgets['threshold'] if threshold is None else threshold
+    failures = []
+    print('{:>24} {:>10} {:>10} {:>12} {:>10}'.format(
+        'blog/command', 'wall', 'budget', 'import', 'budget'), file=out)
+    for key, ratio in sorted(ratios.items()):
+        baseline, limits = budgets['baselines'].get(key, dict()), dict()
+        for name, value in ratio.items():
+            if name in baseline:
+                limits[name] = baseline[name] * (1 + threshold)
+                if value > limits[name]:
+                    failures.append('{} {}: {} > {:.2f}'.format(key, name, value, limits[name]))
+        print('{:>24} {:>10.2f} {:>10} {:>12.2f} {:>10}'.format(
+            key, ratio['wall_ratio'], _format_limit(limits.get('wall_ratio')),
+            ratio['import_ratio'], _format_limit(limits.get('import_ratio')),
+        ), file=out)
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-r', '--runs', type=int, default=5,
+                        help='number of runs per command, median is kept. (default: %(default)s)')
+    parser.add_argument('-t', '--threshold', type=float, default=None,
+                        help='allowed regression over baselines (default: from budgets file).')
+    parser.add_argument('-u', '--update', action='store_true', default=False,
+                        help='write measures as new baselines instead of checking them.')
+    args = parser.parse_args()
+
+    budgets = load_budgets()
+    ratios = measure(args.runs)
+    failures = check(budgets, ratios, args.threshold)
+
+    if args.update:
+        budgets['baselines'] = ratios
+        with open(_BUDGETS, 'w') as f:
+            json.dump(budgets, f, indent=4, sort_keys=True)
+            f.write('\n')
+        print('Baselines written to {}.'.format(_BUDGETS))
+    elif failures:
+        sys.exit('Startup budgets exceeded (threshold {:.0%}):\n  {}'.format(
+            budgets['threshold'] if args.threshold is None else args.threshold,
+            '\n  '.join(failures)))
+
+
+if __name__ == '__main__':
+    main()
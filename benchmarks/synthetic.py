@@ -0,0 +1,59 @@
+# synthetic.py - Generates synthetic blogs for benchmarks.
+# Author: Franck Michea < franck.michea@gmail.com >
+# License: New BSD License (See LICENSE)
+
+'''
+Helpers generating blogs of any size, with the same layout as the test blog
+in tests/data/test-blog-1.
+'''
+
+import datetime
+import os
+
+_NB_AUTHORS = 20
+_NB_CATEGORIES = 30
+
+_PARAGRAPH = (
+    'Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod\n'
+    'tempor incididunt ut labore et dolore magna aliqua. Ut enim ad minim.\n\n'
+)
+_CODE = '    :::c\n' + '    int main(void) { return compute(argc, argv); }\n' * 20 + '\n'
+
+
+def make_blog(root, nb_articles, paragraphs=10):
+    '''Writes a blog with nb_articles articles in root (which must not exist).'''
+    os.makedirs(os.path.join(root, 'articles'))
+
+    with open(os.path.join(root, 'lpbm.cfg'), 'w') as f:
+        f.write('[general]\nurl = https://blog.example.com/\ntitle = Synthetic\n')
+
+    with open(os.path.join(root, 'authors.cfg'), 'w') as f:
+        for idx in range(_NB_AUTHORS):
+            f.write('[author{idx}]\nid = {idx}\nfirst_name = First{idx}\n'
+                    'last_name = Last{idx}\nemail = author{idx}@example.com\n\n'.format(idx=idx))
+
+    with open(os.path.join(root, 'categories.cfg'), 'w') as f:
+        for idx in range(_NB_CATEGORIES):
+            parent = 'parent = {}\n'.format(idx // 5 * 5) if idx % 5 else ''
+            f.write('[Category {idx}]\nid = {idx}\n{parent}slug = category-{idx}\n\n'.format(
+                idx=idx, parent=parent,
+            ))
+
+    date = datetime.datetime(2010, 1, 1)
+    for idx in range(nb_articles):
+        filename = os.path.join(root, 'articles', 'article-{}'.format(idx))
+        title = 'Synthetic Article Number {}'.format(idx)
+        with open(filename + '.markdown', 'w') as f:
+            f.write('{}\n{}\n\n'.format(title, '=' * len(title)))
+            for paragraph in range(paragraphs):
+                f.write(_CODE if paragraph % 4 == 3 else _PARAGRAPH)
+        with open(filename + '.cfg', 'w') as f:
+            f.write('[general]\nid = {}\ndate = {}\nauthors = {}, {}\ncategories = {}\n'
+                    'published = {}\n'.format(
+                        idx,
+                        (date + datetime.timedelta(hours=idx)).strftime('%Y-%m-%dT%H:%M:%S'),
+                        idx % _NB_AUTHORS, (idx + 1) % _NB_AUTHORS,
+                        idx % _NB_CATEGORIES,
+                        'yes' if idx % 10 else 'no',
+                    ))
+    return root
@@ -0,0 +1,80 @@
+# build_manifest.py - Manifest of the files of a generated directory.
+# Author: Franck Michea < franck.michea@gmail.com >
+# License: New BSD License (See LICENSE)
+
+'''
+This module keeps, in a generated directory, the list of files lpbm wrote
+there with a key for each one: a hash of the inputs it was made from (or of
+its content). Next generations use it to skip outputs whose inputs did not
+change and to remove only the files they don't generate anymore.
+'''
+
+import hashlib
+import json
+import os
+
+import lpbm.tools as ltools
+
+MANIFEST_NAME = '.lpbm-manifest.json'
+
+# To be changed when generated files change for the same inputs.
+_MANIFEST_VERSION = 1
+
+
+def hash_file(path, offset=0):
+    '''Returns the sha1 of the content of path, starting at offset.'''
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BuildManifest:
+    '''
+    Keys of the files of output_dir, as written by the previous generation
+    (old, None if unknown) and by the current one (new).
+    '''
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.old, self.new = None, dict()
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                content = json.load(f)
+            if content.get('version') == _MANIFEST_VERSION:
+                self.old = content['files']
+        except (IOError, ValueError, KeyError, AttributeError):
+            pass
+
+    def is_fresh(self, relpath, key):
+        '''
+        Records key as the key of relpath, and returns True if the file of
+        output_dir was made with the same key, so that it can be kept.
+        '''
+        self.new[relpath] = key
+        return (self.old is not None and self.old.get(relpath) == key and
+                os.path.exists(os.path.join(self.output_dir, relpath)))
+
+    def orphans(self):
+        '''Returns files of the previous generation not generated anymore.'''
+        return sorted(set(self.old or ()) - set(self.new))
+
+    def invalidate(self):
+        '''
+        Removes the manifest from output_dir, to be done before modifying its
+        files: they would not match it anymore if the generation fails.
+        '''
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def save(self, directory=None):
+        '''Writes the new manifest, in output_dir or in directory if given.'''
+        path = self.path if directory is None else os.path.join(directory, MANIFEST_NAME)
+        with ltools.atomic_write(path) as f:
+            json.dump({'version': _MANIFEST_VERSION, 'files': self.new}, f,
+                      indent=0, sort_keys=True)
@@ -0,0 +1,71 @@
+# daemon.py - Local socket server and client running lpbm commands.
+# Author: Franck Michea < franck.michea@gmail.com >
+# License: New BSD License (See LICENSE)
+
+'''
+Minimal protocol used between `lpbm serve-daemon` and `lpbm --client`. The
+client connects to a Unix socket, sends one request as a line of JSON and
+reads the JSON response until the daemon closes the connection.
+'''
+
+import json
+import os
+import socket
+
+
+def socket_path(exec_path):
+    '''Returns the path of the socket of the daemon serving blog in exec_path.'''
+    import lpbm.tools as ltools
+    return ltools.cache_path(exec_path, 'daemon.sock')
+
+
+def _read_all(conn):
+    chunks = []
+    while True:
+        chunk = conn.recv(65536)
+        if not chunk:
+            return b''.join(chunks)
+        chunks.append(chunk)
+
+
+def request(path, data, timeout=None):
+    '''
+    Sends data to the daemon listening on path and returns its response.
+    Raises OSError if no daemon is listening.
+    '''
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.settimeout(timeout)
+        conn.connect(path)
+        conn.sendall(json.dumps(data).encode('utf-8') + b'\n')
+        conn.shutdown(socket.SHUT_WR)
+        return json.loads(_read_all(conn).decode('utf-8'))
+
+
+def serve(path, handler):
+    '''
+    Listens on path and answers requests one at a time with handler, which
+    returns the response and whether to stop serving.
+    '''
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(path)
+        server.listen(16)
+        try:
+            stop = False
+            while not stop:
+                conn, _ = server.accept()
+                with conn:
+                    try:
+                        data = json.loads(_read_all(conn).decode('utf-8'))
+                    except ValueError:
+                        continue
+                    response, stop = handler(data)
+                    try:
+                        conn.sendall(json.dumps(response).encode('utf-8'))
+                    except OSError:
+                        pass  # Client went away.
+        finally:
+            os.unlink(path)
@@ -0,0 +1,191 @@
+# fastini.py - Minimal ini files reader and writer.
+# Author: Franck Michea < franck.michea@gmail.com >
+# License: New BSD License (See LICENSE)
+
+'''
+This module provides a minimal replacement for configparser.ConfigParser,
+with the subset of its API used by ConfigModel. It only understands simple
+files (sections with one line `key = value` options and full line comments),
+which is what lpbm writes, and reads and writes them exactly like
+configparser does. Reading anything else raises UnsupportedSyntaxError, so
+that caller can fall back to configparser.
+'''
+
+import configparser
+
+_UNSET = object()
+_INTERPOLATION = configparser.BasicInterpolation()
+_BOOLEAN_STATES = configparser.ConfigParser.BOOLEAN_STATES
+_COMMENT_PREFIXES = ('#', ';')
+
+
+class UnsupportedSyntaxError(Exception):
+    def __init__(self, filename, lineno):
+        self.filename, self.lineno = filename, lineno
+
+    def __str__(self):
+        return 'Syntax not supported by fast ini parser in {} (line {}).'.format(
+            self.filename, self.lineno,
+        )
+
+
+def _split_option(line):
+    '''Splits an option line on its first delimiter, like configparser.'''
+    idx = min((i for i in (line.find('='), line.find(':')) if i != -1), default=-1)
+    if idx == -1:
+        return None, None
+    return line[:idx].rstrip(), line[idx + 1:].strip()
+
+
+class FastConfigParser:
+    '''
+    Drop-in replacement for the parts of configparser.ConfigParser used by
+    ConfigModel, keeping a plain dictionary of sections.
+    '''
+
+    def __init__(self):
+        self._sections = dict()
+
+    def optionxform(self, optionstr):
+        return optionstr.lower()
+
+    def read(self, filenames, encoding=None):
+        '''Reads files, ignoring the ones that cannot be opened.'''
+        if isinstance(filenames, str):
+            filenames = [filenames]
+        read_ok = []
+        for filename in filenames:
+            try:
+                with open(filename, encoding=encoding) as f:
+                    self._read(f, filename)
+            except OSError:
+                continue
+            read_ok.append(filename)
+        return read_ok
+
+    def _read(self, f, filename):
+        sections, current = dict(), None
+        for lineno, line in enumerate(f, start=1):
+            value = line.strip()
+            if not value or value.startswith(_COMMENT_PREFIXES):
+                continue
+            # Indented lines can be continuation lines.
+            if line[0].isspace():
+                raise UnsupportedSyntaxError(filename, lineno)
+            if value.startswith('['):
+                if not value.endswith(']') or len(value) < 3:
+                    raise UnsupportedSyntaxError(filename, lineno)
+                name = value[1:-1]
+                if name in sections or name == configparser.DEFAULTSECT:
+                    raise UnsupportedSyntaxError(filename, lineno)
+                current = sections[name] = dict()
+                continue
+            option, val = _split_option(value)
+            if current is None or not option:
+                raise UnsupportedSyntaxError(filename, lineno)
+            option = self.optionxform(option)
+            if option in current:
+                raise UnsupportedSyntaxError(filename, lineno)
+            current[option] = val
+        for name, options in sections.items():
+            self._sections.setdefault(name, dict()).update(options)
+
+    def read_dict(self, dictionary):
+        for section, options in dictionary.items():
+            section = str(section)
+            if section not in self._sections:
+                self.add_section(section)
+            for key, value in options.items():
+                self.set(section, self.optionxform(str(key)),
+                         None if value is None else str(value))
+
+    def write(self, f):
+        '''Writes sections exactly like configparser.ConfigParser.write.'''
+        for section, options in self._sections.items():
+            f.write('[{}]\n'.format(section))
+            for key, value in options.items():
+                f.write('{} = {}\n'.format(key, str(value).replace('\n', '\n\t')))
+            f.write('\n')
+
+    def sections(self):
+        return list(self._sections)
+
+    def has_section(self, section):
+        return section in self._sections
+
+    def add_section(self, section):
+        if section == configparser.DEFAULTSECT:
+            raise ValueError('Invalid section name: %r' % section)
+        if section in self._sections:
+            raise configparser.DuplicateSectionError(section)
+        self._sections[section] = dict()
+
+    def remove_section(self, section):
+        return self._sections.pop(section, None) is not None
+
+    def options(self, section):
+        try:
+            return list(self._sections[section])
+        except KeyError:
+            raise configparser.NoSectionError(section)
+
+    def has_option(self, section, option):
+        return self.optionxform(option) in self._sections.get(section, ())
+
+    def items(self, section, raw=False):
+        return [(option, self.get(section, option, raw=raw)) for option in self.options(section)]
+
+    def set(self, section, option, value=None):
+        if value:
+            value = _INTERPOLATION.before_set(self, section, option, value)
+        try:
+            self._sections[section][self.optionxform(option)] = value
+        except KeyError:
+            raise configparser.NoSectionError(section)
+
+    def remove_option(self, section, option):
+        try:
+            options = self._sections[section]
+        except KeyError:
+            raise configparser.NoSectionError(section)
+        return options.pop(self.optionxform(option), _UNSET) is not _UNSET
+
+    def get(self, section, option, *, raw=False, fallback=_UNSET):
+        try:
+            options = self._sections[section]
+        except KeyError:
+            if fallback is _UNSET:
+                raise configparser.NoSectionError(section)
+            return fallback
+        option = self.optionxform(option)
+        try:
+            value = options[option]
+        except KeyError:
+            if fallback is _UNSET:
+                raise configparser.NoOptionError(option, section)
+            return fallback
+        if raw or value is None or '%' not in value:
+            return value
+        return _INTERPOLATION.before_get(self, section, option, value, options)
+
+    def _get_conv(self, conv, section, option, raw, fallback):
+        try:
+            value = self.get(section, option, raw=raw)
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            if fallback is _UNSET:
+                raise
+            return fallback
+        return conv(value)
+
+    def getint(self, section, option, *, raw=False, fallback=_UNSET):
+        return self._get_conv(int, section, option, raw, fallback)
+
+    def getfloat(self, section, option, *, raw=False, fallback=_UNSET):
+        return self._get_conv(float, section, option, raw, fallback)
+
+    def getboolean(self, section, option, *, raw=False, fallback=_UNSET):
+        def conv(value):
+            if value.lower() not in _BOOLEAN_STATES:
+                raise ValueError('Not a boolean: %s' % value)
+            return _BOOLEAN_STATES[value.lower()]
+        return self._get_conv(conv, section, option, raw, fallback)
@@ -0,0 +1,107 @@
+# file_index.py - On-disk index of data extracted from source files.
+# Author: Franck Michea < franck.michea@gmail.com >
+# License: New BSD License (See LICENSE)
+
+'''
+This module provides an index keeping data extracted from some files, so that
+they don't need to be parsed again as long as they were not modified. Each
+entry is validated with a stamp made of the modification time and the size of
+the files it was extracted from.
+'''
+
+import hashlib
+import json
+import os
+
+import lpbm.tools as ltools
+
+_INDEX_VERSION = 2
+
+
+def file_stamp(*paths):
+    '''Returns the stamp (mtime and size) of all the paths, None if missing.'''
+    res = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            res.append([st.st_mtime_ns, st.st_size])
+        except OSError:
+            res.append(None)
+    return res
+
+
+def tree_stamp(root):
+    '''
+    Returns a fingerprint of all the files under root (names, modification
+    times and sizes), ignoring hidden files and directories like the cache.
+    '''
+    digest, pending = hashlib.sha1(), [root]
+    while pending:
+        try:
+            entries = sorted(os.scandir(pending.pop()), key=lambda entry: entry.name)
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                    continue
+                st = entry.stat()
+            except OSError:
+                continue
+            digest.update(os.fsencode(entry.path))
+            digest.update(b'\0%d\0%d\n' % (st.st_mtime_ns, st.st_size))
+    return digest.hexdigest()
+
+
+class FileIndex:
+    '''
+    Index mapping a key (usually a relative path) to data, valid as long as
+    the stamp of the files is the same.
+    '''
+
+    def __init__(self, filename):
+        self.filename, self.modified = filename, False
+        try:
+            with open(filename, 'r', encoding='utf-8') as f:
+                content = json.load(f)
+            if content.get('version') != _INDEX_VERSION:
+                raise ValueError('unknown index version')
+            self._entries = content['entries']
+        except (IOError, ValueError, KeyError, AttributeError):
+            self._entries = dict()
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, stamp):
+        '''Returns data of key if stamp is still the same, else None.'''
+        try:
+            entry = self._entries[key]
+        except KeyError:
+            return None
+        if entry['stamp'] != stamp:
+            return None
+        return entry['data']
+
+    def set(self, key, stamp, data):
+        self._entries[key] = {'stamp': stamp, 'data': data}
+        self.modified = True
+
+    def prune(self, keys):
+        '''Removes every entry which key is not in keys.'''
+        keys = set(keys)
+        for key in [key for key in self._entries if key not in keys]:
+            del self._entries[key]
+            self.modified = True
+
+    def save(self):
+        '''Writes the index back, only if it was modified since loaded.'''
+        if not self.modified:
+            return
+        ltools.mkdir_p(os.path.dirname(self.filename))
+        with ltools.atomic_write(self.filename) as f:
+            json.dump({'version': _INDEX_VERSION, 'entries': self._entries}, f)
+        self.modified = False
@@ -0,0 +1,91 @@
+# filesync.py - Copies files without moving bytes when possible.
+# Author: Franck Michea < franck.michea@gmail.com >
+# License: New BSD License (See LICENSE)
+
+'''
+This module places copies of files (medias of the blog mostly) in another
+directory as cheaply as possible: files are hard linked when source and
+target are on the same filesystem, else copied with copy_file_range (which
+lets the kernel copy without reading data in userspace, or share extents on
+filesystems supporting reflinks), else copied normally. Targets are replaced
+atomically and keep the modification time of their source, so that unchanged
+files can be recognized later from their stamp.
+'''
+
+import os
+import shutil
+
+import lpbm.tools as ltools
+
+LINKED, COPIED = 'linked', 'copied'
+
+
+def same_stamp(source, target):
+    '''Tells if target has the same size and modification time as source.'''
+    try:
+        src, dst = os.stat(source), os.stat(target)
+    except OSError:
+        return False
+    return src.st_size == dst.st_size and src.st_mtime_ns == dst.st_mtime_ns
+
+
+def _copy_range(source, target):
+    with open(source, 'rb') as fsrc, open(target, 'wb') as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        while size > 0:
+            copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), size)
+            if copied == 0:
+                break
+            size -= copied
+        if size > 0:
+            raise OSError('source file was truncated while being copied')
+
+
+def place(source, target):
+    '''
+    Makes target a copy of source, and returns how it was done: LINKED or
+    COPIED.
+    '''
+    dirname, basename = os.path.split(target)
+    ltools.mkdir_p(dirname)
+    tmp = os.path.join(dirname, '.{}.lpbm-tmp'.format(basename))
+    try:
+        os.unlink(tmp)
+    except FileNotFoundError:
+        pass
+    try:
+        os.link(source, tmp)
+        method = LINKED
+    except OSError:
+        try:
+            _copy_range(source, tmp)
+        except (AttributeError, OSError):
+            shutil.copyfile(source, tmp)
+        shutil.copystat(source, tmp)
+        method = COPIED
+    os.replace(tmp, target)
+    return method
+
+
+def place_all(files, jobs=4):
+    '''
+    Places every (source, target) of files with a pool of jobs threads, copies
+    being bound by IO. Returns the number of bytes placed with each method.
+    '''
+    def place_one(item):
+        source, target = item
+        return place(source, target), os.path.getsize(target)
+
+    res = {LINKED: 0, COPIED: 0}
+    for method, size in ltools.parallel_map(place_one, list(files), jobs):
+        res[method] += size
+    return res
+
+
+def format_size(size):
+    '''Returns size, in bytes, in a human readable form.'''
+    for unit in ['B', 'KiB', 'MiB', 'GiB']:
+        if size < 1024 or unit == 'GiB':
+            break
+        size /= 1024.0
+    return '{:.1f} {}'.format(size, unit) if unit != 'B' else '{} B'.format(size)
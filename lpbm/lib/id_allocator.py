@@ -0,0 +1,35 @@
+# id_allocator.py - Allocation of ids for model objects.
+# Author: Franck Michea < franck.michea@gmail.com >
+# License: New BSD License (See LICENSE)
+
+'''
+Keeps track of the ids used by the objects of a model manager, so that
+checking if an id is used and finding a new one is done in constant time.
+'''
+
+
+class IdAllocator:
+    '''
+    Set of used ids with a high-water mark: new ids are allocated after the
+    highest id ever registered.
+    '''
+
+    def __init__(self):
+        self._ids, self.high = set(), None
+
+    def __contains__(self, id):
+        return id in self._ids
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, id):
+        if id is None:
+            return
+        self._ids.add(id)
+        if self.high is None or self.high < id:
+            self.high = id
+
+    def next_id(self):
+        '''Returns the id that should be given to a new object.'''
+        return 0 if self.high is None else self.high + 1
@@ -0,0 +1,67 @@
+# scheduler.py - Runs tasks concurrently following their dependencies.
+# Author: Franck Michea < franck.michea@gmail.com >
+# License: New BSD License (See LICENSE)
+
+'''
+This module runs a graph of tasks in threads. Each task starts as soon as all
+the tasks it depends on are done, so independent tasks overlap.
+'''
+
+import concurrent.futures
+import time
+
+
+def _check_graph(tasks, dependencies):
+    '''Raises ValueError if a dependency is unknown or if there is a cycle.'''
+    for name, deps in dependencies.items():
+        for dep in deps:
+            if dep not in tasks:
+                raise ValueError('Task {} depends on unknown task {}.'.format(name, dep))
+    done, remaining = set(), set(tasks)
+    while remaining:
+        ready = set(name for name in remaining if set(dependencies.get(name, ())) <= done)
+        if not ready:
+            raise ValueError('Tasks have cyclic dependencies: {}.'.format(
+                ', '.join(sorted(remaining))))
+        done |= ready
+        remaining -= ready
+
+
+def run_graph(tasks, dependencies):
+    '''
+    Runs tasks (callables without arguments, by name) in threads. A task is
+    started once all the tasks it depends on (dependencies, lists of names by
+    name) are done. Returns, by name, the time at which each task started and
+    its duration in seconds, relative to the start of the run. If a task
+    raises, no other task is started and the error is raised again once the
+    running ones are done.
+    '''
+    _check_graph(tasks, dependencies)
+    start, timings = time.perf_counter(), dict()
+
+    def run(name):
+        begin = time.perf_counter()
+        tasks[name]()
+        timings[name] = (begin - start, time.perf_counter() - begin)
+
+    remaining = dict((name, set(dependencies.get(name, ()))) for name in tasks)
+    done, running, error = set(), dict(), None
+    with concurrent.futures.ThreadPoolExecutor(max(len(tasks), 1)) as pool:
+        while running or (remaining and error is None):
+            if error is None:
+                for name in sorted(name for name, deps in remaining.items() if deps <= done):
+                    del remaining[name]
+                    running[pool.submit(run, name)] = name
+            finished, _ = concurrent.futures.wait(
+                running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    future.result()
+                except BaseException as err:
+                    error = error or err
+                else:
+                    done.add(name)
+    if error is not None:
+        raise error
+    return timings
@@ -0,0 +1,65 @@
+# snapshot.py - Snapshots of loaded objects, for warm starts.
+# Author: Franck Michea < franck.michea@gmail.com >
+# License: New BSD License (See LICENSE)
+
+'''
+This module keeps the state of a loaded module (its objects mostly) pickled in
+the cache directory of the blog, so that next runs can get it back without
+parsing any source file. A snapshot is only used if its fingerprint, made of
+the modification times and sizes of the sources it was loaded from, is the
+same.
+'''
+
+import gc
+import hashlib
+import os
+import pickle
+
+import lpbm.tools as ltools
+from lpbm.lib.file_index import file_stamp, tree_stamp
+
+_SNAPSHOT_VERSION = 2
+
+
+def fingerprint(root, sources, *extra):
+    '''
+    Returns the fingerprint of sources (files or directories relative to
+    root), and of extra values that change what is loaded from them.
+    '''
+    digest = hashlib.sha1(repr((_SNAPSHOT_VERSION, root) + extra).encode('utf-8'))
+    for source in sources:
+        path = os.path.join(root, source)
+        if os.path.isdir(path):
+            digest.update(tree_stamp(path).encode('ascii'))
+        else:
+            digest.update(repr(file_stamp(path)).encode('ascii'))
+    return digest.hexdigest()
+
+
+def load(filename, fingerprint):
+    '''Returns the state kept in filename, None if missing or outdated.'''
+    # Everything loaded stays alive, garbage collection would only slow down
+    # the creation of many objects.
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with open(filename, 'rb') as f:
+            version, stored = pickle.load(f), pickle.load(f)
+            if version != _SNAPSHOT_VERSION or stored != fingerprint:
+                return None
+            return pickle.load(f)
+    except Exception:
+        # Missing, truncated or made by another version of the models.
+        return None
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def save(filename, fingerprint, state):
+    '''Writes state in filename, with the fingerprint of its sources.'''
+    ltools.mkdir_p(os.path.dirname(filename))
+    with ltools.atomic_write(filename, binary=True) as f:
+        pickle.dump(_SNAPSHOT_VERSION, f, pickle.HIGHEST_PROTOCOL)
+        pickle.dump(fingerprint, f, pickle.HIGHEST_PROTOCOL)
+        pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
@@ -0,0 +1,149 @@
+# sqlitestore.py - Model metadata kept in a single SQLite file.
+# Author: Franck Michea < franck.michea@gmail.com >
+# License: New BSD License (See LICENSE)
+
+'''
+This module provides a store keeping the content of all the configuration
+files of a blog (authors.cfg, categories.cfg and articles' cfg files) in one
+SQLite database, and a configuration backend reading and writing it. Files
+are identified by their path relative to the root of the blog. Order of
+sections and options is kept, so files can be exported back identically.
+'''
+
+import os
+import sqlite3
+import threading
+
+from lpbm.lib.fastini import FastConfigParser
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sections (
+    file TEXT NOT NULL,
+    section TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (file, section)
+);
+CREATE TABLE IF NOT EXISTS options (
+    file TEXT NOT NULL,
+    section TEXT NOT NULL,
+    option TEXT NOT NULL,
+    value TEXT,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (file, section, option)
+);
+'''
+
+
+class Store:
+    '''
+    SQLite database holding configuration files of the blog in root. All the
+    content is read once, on first access, and kept in memory.
+    '''
+
+    def __init__(self, path, root):
+        self.path, self.root = path, os.path.realpath(root)
+        self._lock, self._files = threading.Lock(), None
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def key(self, filename):
+        '''Returns the key of filename in the store (path relative to root).'''
+        return os.path.relpath(os.path.realpath(filename), self.root)
+
+    def _load(self):
+        with self._lock:
+            if self._files is not None:
+                return self._files
+            files = dict()
+            query = 'SELECT file, section FROM sections ORDER BY file, position'
+            for filename, section in self._db.execute(query):
+                files.setdefault(filename, dict())[section] = dict()
+            query = 'SELECT file, section, option, value FROM options ORDER BY file, position'
+            for filename, section, option, value in self._db.execute(query):
+                files[filename][section][option] = value
+            self._files = files
+            return files
+
+    def files(self):
+        return sorted(self._load())
+
+    def exists(self, filename):
+        return self.key(filename) in self._load()
+
+    def get_file(self, filename):
+        '''Returns sections of filename (dict of dicts), None if missing.'''
+        return self._load().get(self.key(filename))
+
+    def save_file(self, filename, sections):
+        '''Replaces the content of filename in the store with sections.'''
+        self.save_files({filename: sections})
+
+    def save_files(self, files, replace=False):
+        '''
+        Saves several files (filename to sections) in one transaction. With
+        replace, every other file is removed from the store.
+        '''
+        content = self._load()
+        files = dict(
+            (self.key(filename), dict((name, dict(options)) for name, options in sections.items()))
+            for filename, sections in files.items()
+        )
+        with self._lock, self._db:
+            if replace:
+                self._db.execute('DELETE FROM sections')
+                self._db.execute('DELETE FROM options')
+                content.clear()
+            else:
+                self._db.executemany('DELETE FROM sections WHERE file = ?',
+                                     [(key,) for key in files])
+                self._db.executemany('DELETE FROM options WHERE file = ?',
+                                     [(key,) for key in files])
+            self._db.executemany(
+                'INSERT INTO sections (file, section, position) VALUES (?, ?, ?)',
+                [
+                    (key, name, idx)
+                    for key, sections in files.items()
+                    for idx, name in enumerate(sections)
+                ],
+            )
+            self._db.executemany(
+                'INSERT INTO options (file, section, option, value, position) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [
+                    (key, name, option, value, idx)
+                    for key, sections in files.items()
+                    for name, options in sections.items()
+                    for idx, (option, value) in enumerate(options.items())
+                ],
+            )
+            content.update(files)
+
+
+class StoreConfigParser(FastConfigParser):
+    '''Configuration backend reading and writing files in a Store.'''
+
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+
+    def read(self, filenames, encoding=None):
+        if isinstance(filenames, str):
+            filenames = [filenames]
+        read_ok = []
+        for filename in filenames:
+            sections = self.store.get_file(filename)
+            if sections is None:
+                continue
+            for name, options in sections.items():
+                self._sections.setdefault(name, dict()).update(options)
+            read_ok.append(filename)
+        return read_ok
+
+    def exists(self, filename):
+        return self.store.exists(filename)
+
+    def persist(self, filename):
+        self.store.save_file(filename, self._sections)
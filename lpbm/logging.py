@@ -50,6 +50,7 @@ class WaitingConfigurationHandler(logging.handlers.MemoryHandler):
 
 
 _TEMP_HANDLER = WaitingConfigurationHandler()
+_HANDLERS = []
 
 
 def get():
@@ -76,6 +77,10 @@ def configure(config):
     logger = get()
     logger.removeHandler(_TEMP_HANDLER)
 
+    # Handlers of a previous configuration are replaced (by serve-daemon).
+    for handler in _HANDLERS:
+        logger.removeHandler(handler)
+
     # Loading configuration
     handlers = []
     if 'logging-std' in config:
@@ -84,6 +89,7 @@ def configure(config):
         handlers.append(handler)
 
     _TEMP_HANDLER.setTargets(handlers)
+    _HANDLERS[:] = handlers
     for handler in handlers:
         handler.setFormatter(_FORMATTER)
         logger.addHandler(handler)
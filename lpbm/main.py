@@ -10,19 +10,17 @@ details.
 '''
 
 import argparse
-import pdb
+import os
 import sys
 import traceback
 
 import lpbm.logging
 import lpbm.module_loader
 
-_MODULES = dict()
+_MODULES = lpbm.module_loader.LazyModules()
 
 
-def load_cmd_parser():
-    # Command line arguments.
-    parser = argparse.ArgumentParser(description='Lightweight Personal Blog Maker')
+def _add_global_options(parser):
     parser.add_argument('-b', '--backtrace', action='store_true', default=False,
                         help='print backtrace on error (default with pdb).')
     parser.add_argument('-d', '--debug', action='store_true', default=False,
@@ -30,32 +28,132 @@ def load_cmd_parser():
 
     _help = 'path where lpbm will search the blog. (default: %(default)s)'
     parser.add_argument('-p', '--exec-path', action='store', default='.', help=_help)
+    _help = 'keep parsed blog sources in a cache directory to speed up next runs.'
+    parser.add_argument('-c', '--cache', action='store_true', default=False, help=_help)
+    _help = 'keep a compact read-only representation of articles in memory.'
+    parser.add_argument('-C', '--compact', action='store_true', default=False, help=_help)
+    _help = ('number of threads used to load blog sources and copy medias, and of processes '
+             'used to render them. (default: %(default)s)')
+    parser.add_argument('-j', '--jobs', action='store', type=int, default=1, help=_help)
     parser.add_argument('-P', '--pdb', action='store_true', default=False,
                         help='start pdb debugger on exception.')
-    subparser = parser.add_subparsers()
+    _help = 'run the command in the daemon started with serve-daemon, if any.'
+    parser.add_argument('--client', action='store_true', default=False, help=_help)
 
-    # Tools are loaded dynamically, so argument parser isn't complete.
-    lpbm.module_loader.load_modules(_MODULES, subparser)
 
-    return parser
+class _GlobalOptionsParser(argparse.ArgumentParser):
+    '''Parser of global options raising ValueError instead of exiting.'''
 
+    def error(self, message):
+        raise ValueError(message)
 
-def main(args=None):
-    '''Initialization of logging module and parser. Calls module_loader.'''
-    lpbm.logging.init()
 
-    parser = load_cmd_parser()
+def _global_options(args):
+    '''
+    Returns global options in arguments, and the index of the command in them
+    (None if there is none). Only arguments before the command are parsed,
+    options of the command can have the same names as global ones.
+    '''
+    parser = _GlobalOptionsParser(add_help=False)
+    _add_global_options(parser)
+    for idx, arg in enumerate(args):
+        if arg == '--':
+            break
+        if arg.startswith('-'):
+            continue
+        # Not the command if it is the value of an option.
+        try:
+            return parser.parse_known_args(args=args[:idx])[0], idx
+        except ValueError:
+            continue
+    try:
+        return parser.parse_known_args(args=args)[0], None
+    except ValueError:
+        # Reported when arguments are parsed for real.
+        return parser.parse_known_args(args=[])[0], None
 
-    args = parser.parse_args(args=args)
-    if hasattr(args, 'func'):
+
+def _find_command(args):
+    '''Returns the name of the command in arguments, None if there is none.'''
+    args = sys.argv[1:] if args is None else args
+    _, idx = _global_options(args)
+    return None if idx is None else args[idx]
+
+
+def _run_client(args):
+    '''
+    Sends the command to the daemon serving the blog and outputs its result.
+    Returns False if no daemon is serving the blog.
+    '''
+    import lpbm.lib.daemon as daemon
+
+    options, _ = _global_options(args)
+    path = daemon.socket_path(options.exec_path)
+    data = {'args': [arg for arg in args if arg != '--client'], 'cwd': os.getcwd()}
+    try:
+        response = daemon.request(path, data)
+    except OSError as err:
+        lpbm.logging.get().debug('No daemon on %s (%s), running locally.', path, err)
+        return False
+    sys.stdout.write(response['stdout'])
+    sys.stderr.write(response['stderr'])
+    if response['status']:
+        sys.exit(response['status'])
+    return True
+
+
+def load_cmd_parser(args=None, modules=None):
+    '''
+    Returns the parser of the command line. Modules are kept in modules
+    (_MODULES by default), which is cleared first.
+    '''
+    modules = _MODULES if modules is None else modules
+
+    # Command line arguments.
+    parser = argparse.ArgumentParser(description='Lightweight Personal Blog Maker')
+    _add_global_options(parser)
+    subparser = parser.add_subparsers()
+
+    # Only the module of the command run is imported and gets a full parser,
+    # other modules are imported by modules if they are needed.
+    modules.clear()
+    lpbm.module_loader.load_modules(modules, subparser, _find_command(args))
+
+    return parser
+
+
+def run_command(parser, func, modules, args):
+    '''Calls func (module_process of the command) with modules and args.'''
+    if func is not None:
         try:
-            args.func(_MODULES, args)
+            func(modules, args)
         except Exception as err:
             if args.backtrace or args.pdb:
                 traceback.print_exc()
             if args.pdb:
+                import pdb
                 pdb.post_mortem(sys.exc_info()[2])
             elif not args.backtrace:
                 sys.exit('ERROR: ' + str(err))
     else:
         parser.print_help()
+
+
+def main(args=None):
+    '''Initialization of logging module and parser. Calls module_loader.'''
+    lpbm.logging.init()
+
+    args = sys.argv[1:] if args is None else args
+    if _global_options(args)[0].client and _run_client(args):
+        return
+
+    parser = load_cmd_parser(args)
+
+    args = parser.parse_args(args=args)
+    try:
+        run_command(parser, getattr(args, 'func', None), _MODULES, args)
+    finally:
+        # Configuration module opens the store of the blog, if it has one.
+        if 'lpbm.lib.sqlitestore' in sys.modules:
+            from lpbm.models.configmodel import close_store
+            close_store()
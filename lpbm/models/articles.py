@@ -4,9 +4,10 @@
 
 '''This module contains the data model for Articles in blog sources.'''
 
-import codecs
 import datetime
+import hashlib
 import os
+import re
 
 import lpbm.models.configmodel as cm_module
 import lpbm.tools as ltools
@@ -27,40 +28,139 @@ class ArticleSameIdError(Exception):
         )
 
 
-_TITLE_SEPARATOR = '=='
+_TITLE_SEPARATOR = b'=='
 _FRMT_DATE_CONF = '%Y-%m-%dT%H:%M:%S'
+_HEADER_CHUNK_SIZE = 4096
 
 
-def translate_to_jekyll_markdown(contents):
-    lines, in_code = [], False
+def _separator_index(data):
+    '''Returns the index of the first line starting with SEPARATOR, or -1.'''
+    if data.startswith(_TITLE_SEPARATOR):
+        return 0
+    idx = data.find(b'\n' + _TITLE_SEPARATOR)
+    return idx if idx == -1 else idx + 1
 
-    for line in contents.splitlines():
-        line_stripped = line.lstrip()
-        if line_stripped.startswith(':::lpbm'):
-            continue
-        elif line_stripped.startswith(':::'):
-            line = '```' + line_stripped[3:]
-            in_code = True
-        elif in_code:
-            if line_stripped and not line.startswith(' '):
-                popped = lines[-1] == ''
-                if popped:
-                    lines.pop()
 
-                lines.append('```')
+def _split_source(data):
+    '''
+    Splits the source of an article in its title and the offset of its content,
+    without copying the content. Lines of the title are concatenated without
+    their line feed. Offset is None when no separator is found, in which case
+    the whole source is the title.
+    '''
+    sep = _separator_index(data)
+    if sep == -1:
+        return data.decode('utf-8')[:-1].replace('\n', ''), None
+    title = data[:sep][:-1].replace(b'\n', b'').decode('utf-8')
+    end = data.find(b'\n', sep)
+    return title, (len(data) if end == -1 else end + 1)
+
+
+def _read_header(f):
+    '''
+    Reads the beginning of a source file, up to the end of the separator line
+    (or the whole file if there is none), by chunks.
+    '''
+    chunks, data = [], b''
+    while True:
+        chunk = f.read(_HEADER_CHUNK_SIZE)
+        if not chunk:
+            return data
+        chunks.append(chunk)
+        data = b''.join(chunks)
+        sep = _separator_index(data)
+        if sep != -1 and data.find(b'\n', sep) != -1:
+            return data
+
+
+def read_content(path, offset):
+    '''Reads the content of an article, starting at offset in its source.'''
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        return f.read().decode('utf-8')
+
+
+# Line boundaries are the same as the ones of str.splitlines.
+_LINE_BREAK_RE = re.compile('\r\n|[\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]')
+_BLOCK_RE = re.compile(r'\s*:::(lpbm)?(.*)')
+
 
-                if popped:
-                    lines.append('')
+def _iter_lines(contents):
+    '''Yields the lines of contents like str.splitlines, without a list.'''
+    start = 0
+    for match in _LINE_BREAK_RE.finditer(contents):
+        yield contents[start:match.start()]
+        start = match.end()
+    if start < len(contents):
+        yield contents[start:]
 
+
+def iter_jekyll_markdown(contents):
+    '''
+    Yields the translation of contents to jekyll's markdown line by line. The
+    last line is kept back since closing a code block may need to reorder it.
+    '''
+    pending, in_code = None, False
+
+    for line in _iter_lines(contents):
+        match = _BLOCK_RE.match(line)
+        if match is not None and match.group(1) is not None:
+            continue
+        elif match is not None:
+            line = '```' + match.group(2)
+            in_code = True
+        elif in_code:
+            if line and not line.isspace() and not line.startswith(' '):
+                if pending == '':
+                    yield '```\n'
+                else:
+                    yield pending + '\n'
+                    pending = '```'
                 in_code = False
             else:
                 line = line[4:] if line.startswith('    ') else line
 
-        lines.append(line)
-    return '\n'.join(lines) + '\n'
+        if pending is not None:
+            yield pending + '\n'
+        pending = line
+    yield (pending or '') + '\n'
+
 
+def write_jekyll_markdown(contents, f):
+    '''Writes the translation of contents to jekyll's markdown in f.'''
+    f.writelines(iter_jekyll_markdown(contents))
 
-class Article(cm_module.Model):
+
+def translate_to_jekyll_markdown(contents):
+    return ''.join(iter_jekyll_markdown(contents))
+
+
+class _ArticleLinksMixin:
+    '''Filenames and links of an article, shared by all its representations.'''
+
+    __slots__ = ()
+
+    def html_filename(self):
+        '''Returns the filename of the HTML file for that article.'''
+        filename = os.path.basename(self.filename)
+        return '%d-%s.html' % (self.id, filename)
+
+    def jekyll_url(self):
+        dt = self.date.strftime('%Y/%m/%d')
+        filename = os.path.basename(self.filename)
+        return '%s/%s.html' % (dt, filename)
+
+    def jekyll_markdown_filename(self):
+        dt = self.date.strftime('%Y-%m-%d')
+        filename = os.path.basename(self.filename)
+        return '%s-%s.md' % (dt, filename)
+
+    def url(self):
+        '''The direct link to the article.'''
+        return os.path.join('/', 'articles', self.html_filename())
+
+
+class Article(_ArticleLinksMixin, cm_module.Model):
     '''
     The actual model. Articles are devided in two files. The actual article
     (written in markdown syntax) and a configuration file containing information
@@ -68,39 +168,36 @@ class Article(cm_module.Model):
     '''
 
     title = cm_module.field('title', required=True)
-    published = cm_module.opt_bool('general', 'published', default=False)
+    published = cm_module.opt_bool('general', 'published', default=False, indexed=True)
 
     _date = cm_module.opt('general', 'date')
     _authors = cm_module.opt('general', 'authors', default='')
     _categories = cm_module.opt('general', 'categories', default='')
 
-    def __init__(self, mod, mods, filename=None):
+    def __init__(self, mod, mods, filename=None, lazy=False, metadata=None, keep_config=False):
         super().__init__(mod, mods)
+        self._parsed_date, self._sort_key = None, None
+        self._jekyll_content = None
 
-        self.title, self._content = '', ''
         try:
             self.filename, self.path = filename[:-9], filename
         except TypeError:
             self.filename, self.path = '', ''
 
-        # Reads the content of the file, config being before SEPARATOR
-        try:
-            f = codecs.open(filename, 'r', 'utf-8')
-            line = f.readline()
-            while line:
-                if line.startswith(_TITLE_SEPARATOR):
-                    line = f.readline()
-                    break
-                self.title += line[:-1]
-                line = f.readline()
-            while line:
-                self._content += line
-                line = f.readline()
-        except (IOError, TypeError):
-            pass
+        # Metadata comes from the articles index, only content is read from the
+        # markdown file, when needed.
+        if metadata is not None:
+            self.title, self._content_offset = metadata['title'], metadata['offset']
+            self._content = None if self._content_offset is not None else ''
+            self.cm = cm_module.ConfigModel.from_dict(self._config_filename(),
+                                                      metadata['config'], backend='fast')
+        else:
+            self._read_markdown(filename, lazy)
+            self.cm = cm_module.ConfigModel(self._config_filename(), backend='fast')
+        self._saved_title = self.title
 
-        # Model configuration.
-        self.cm = cm_module.ConfigModel(self._config_filename())
+        # Configuration as read, before defaults are set, for metadata.
+        self._read_config = self.cm.to_dict() if keep_config else None
 
         # Interactive fields.
         self._interactive_fields = ['title']
@@ -113,9 +210,65 @@ class Article(cm_module.Model):
         self.categories = self._categories
 
         # If creating the article, set date to now.
-        if self._date is None:
+        self._undated = self._date is None
+        if self._undated:
             self.date = datetime.datetime.now()
 
+    def __getstate__(self):
+        '''
+        Date given to an article without one is not kept, it is given again
+        when the article is restored, as if it was loaded again.
+        '''
+        state = super().__getstate__()
+        if self._undated:
+            config = self.cm.to_dict()
+            config.get('general', dict()).pop('date', None)
+            state['cm'] = cm_module.ConfigModel.from_dict(self.cm.filename, config,
+                                                          backend=self.cm.backend)
+            state['_parsed_date'] = state['_sort_key'] = None
+        return state
+
+    def __setstate__(self, state):
+        vars(self).update(state)
+        if self._undated:
+            self.date = datetime.datetime.now()
+
+    def _read_markdown(self, filename, lazy):
+        '''
+        Reads the title of the file, content being after SEPARATOR. In lazy
+        mode, only the offset of the content is kept and it is read the first
+        time it is needed.
+        '''
+        self.title, self._content, self._content_offset = '', '', None
+        try:
+            with open(filename, 'rb') as f:
+                data = _read_header(f) if lazy else f.read()
+        except (IOError, TypeError):
+            return
+        self.title, offset = _split_source(data)
+        if offset is not None and lazy:
+            self._content, self._content_offset = None, offset
+        elif offset is not None:
+            self._content = str(memoryview(data)[offset:], 'utf-8')
+
+    def metadata(self):
+        '''
+        Returns what is needed to build the article again without parsing its
+        files, as stored in the articles index. The article must have been
+        created with keep_config, so that defaults (like the date of an article
+        without one) are set again when it is built. It is only returned once.
+        '''
+        if self._content_offset is None and self._content:
+            raise ValueError('Article content is not lazily loaded.')
+        if self._read_config is None:
+            raise ValueError('Article configuration as read was not kept.')
+        config, self._read_config = self._read_config, None
+        return {
+            'title': self.title,
+            'offset': self._content_offset,
+            'config': config,
+        }
+
     def __str__(self):
         return '"{title}" by {authors} [{published}]'.format(
             id=self.id,
@@ -126,21 +279,44 @@ class Article(cm_module.Model):
 
     def __lt__(self, other):
         '''Articles are sorted by date'''
-        return (self.date, self.id) < (other.date, other.id)
+        return self.sort_key < other.sort_key
 
-    def save(self):
-        '''Articles' configuration is saved automatically.'''
-        with codecs.open(self._markdown_filename(), 'w', 'utf-8') as f:
-            # Then we have the title.
-            f.write(self.title + '\n')
-            f.write(len(self.title) * '=' + '\n')
+    @property
+    def sort_key(self):
+        '''Key used to sort articles (date, then id), computed only once.'''
+        if self._sort_key is None:
+            self._sort_key = (self.date, self.id)
+        return self._sort_key
 
-            # End finally we have the content.
-            f.write(self._content)
+    def _reindex(self):
+        # Sort key is made of indexed fields (date and id).
+        self._sort_key = None
+        super()._reindex()
 
-        # Saving special fields configuration
-        self._authors = ', '.join(list(self._authors_set))
-        self._categories = ', '.join(list(self._categories_set))
+    def save(self):
+        '''
+        Articles' configuration is saved automatically. Files are only written
+        if they were modified.
+        '''
+        filename = self._markdown_filename()
+        if self._saved_title != self.title or not os.path.exists(filename):
+            # Content must be read before the markdown file is replaced.
+            content = self.content
+            with ltools.atomic_write(filename) as f:
+                # Then we have the title.
+                f.write(self.title + '\n')
+                f.write(len(self.title) * '=' + '\n')
+
+                # End finally we have the content.
+                f.write(content)
+            self._saved_title = self.title
+
+        # Saving special fields configuration, keeping their order if they
+        # didn't change.
+        if set(ltools.split_on_comma(self._authors)) != self._authors_set:
+            self._authors = ', '.join(list(self._authors_set))
+        if set(ltools.split_on_comma(self._categories)) != self._categories_set:
+            self._categories = ', '.join(list(self._categories_set))
 
         # Finally saving everything.
         super().save()
@@ -179,8 +355,8 @@ class Article(cm_module.Model):
         )
 
     def delete(self):
-        super().delete()
         self.published = False
+        super().delete()
 
     @property
     def authors(self):
@@ -194,6 +370,7 @@ class Article(cm_module.Model):
         the article.
         '''
         self._authors_set = set(ltools.split_on_comma(authors))
+        self._reindex()
 
     @property
     def categories(self):
@@ -202,27 +379,44 @@ class Article(cm_module.Model):
     @categories.setter
     def categories(self, value):
         self._categories_set = set(ltools.split_on_comma(value))
+        self._reindex()
 
     @property
     def date(self):
         '''Translates date string in configuration to a timestamp. (getter).'''
-        try:
-            return datetime.datetime.strptime(self._date, _FRMT_DATE_CONF)
-        except ValueError:
-            return datetime.datetime.fromtimestamp(0)
+        if self._parsed_date is None:
+            try:
+                self._parsed_date = datetime.datetime.strptime(self._date, _FRMT_DATE_CONF)
+            except ValueError:
+                self._parsed_date = datetime.datetime.fromtimestamp(0)
+        return self._parsed_date
 
     @date.setter
     def date(self, value):
         '''Translates a date as a string in the right format. (setter).'''
+        self._parsed_date = None
         if value is None:
             self._date = None
         else:
             self._date = value.strftime(_FRMT_DATE_CONF)
+        self._reindex()
 
     @property
     def content(self):
+        '''Returns the content of the article, reading it if it is not loaded yet.'''
+        if self._content is None:
+            self._content = read_content(self.path, self._content_offset)
         return self._content
 
+    def content_source(self):
+        '''
+        Returns the path and offset content can be read from with read_content,
+        or None if content is already in memory.
+        '''
+        if self._content is None:
+            return self.path, self._content_offset
+        return None
+
     def _config_filename(self):
         '''Returns the filename with config's extension.'''
         return '{filename}.cfg'.format(filename=self.filename)
@@ -231,25 +425,6 @@ class Article(cm_module.Model):
         '''Returns the filename with markdown's extension.'''
         return '{filename}.markdown'.format(filename=self.filename)
 
-    def html_filename(self):
-        '''Returns the filename of the HTML file for that article.'''
-        filename = os.path.basename(self.filename)
-        return '%d-%s.html' % (self.id, filename)
-
-    def jekyll_url(self):
-        dt = self.date.strftime('%Y/%m/%d')
-        filename = os.path.basename(self.filename)
-        return '%s/%s.html' % (dt, filename)
-
-    def jekyll_markdown_filename(self):
-        dt = self.date.strftime('%Y-%m-%d')
-        filename = os.path.basename(self.filename)
-        return '%s-%s.md' % (dt, filename)
-
-    def url(self):
-        '''The direct link to the article.'''
-        return os.path.join('/', 'articles', self.html_filename())
-
     def publish(self):
         '''
         Set everything needed to publish an article (published flag and date).
@@ -259,4 +434,83 @@ class Article(cm_module.Model):
 
     @property
     def jekyll_content(self):
-        return translate_to_jekyll_markdown(self._content)
+        '''Translation of the content to jekyll, cached until content changes.'''
+        content = self.content
+        digest = hashlib.sha1(content.encode('utf-8')).digest()
+        if self._jekyll_content is None or self._jekyll_content[0] != digest:
+            self._jekyll_content = (digest, translate_to_jekyll_markdown(content))
+        return self._jekyll_content[1]
+
+
+_INTERNED_IDS = dict()
+
+
+def _intern_ids(ids):
+    '''Returns a sorted tuple of ids, shared by all articles with the same ids.'''
+    ids = tuple(sorted(ids))
+    return _INTERNED_IDS.setdefault(ids, ids)
+
+
+class CompactArticle(_ArticleLinksMixin):
+    '''
+    Read-only representation of an article, for very large blogs. Fields are
+    decoded once from the full article and stored in slots, configuration
+    and content are not kept in memory. Use materialize to get back a full
+    Article that can be modified and saved.
+    '''
+
+    __slots__ = (
+        'id', 'title', 'date', 'published', 'deleted', 'authors', 'categories',
+        'path', '_content_offset', '_undated',
+    )
+
+    def __init__(self, article):
+        self.id, self.title, self.date = article.id, article.title, article.date
+        self.published, self.deleted = article.published, article.deleted
+        self.authors = _intern_ids(article.authors)
+        self.categories = _intern_ids(article.categories)
+        self.path, self._content_offset = article.path, article._content_offset
+        self._undated = article._undated
+        if self._content_offset is None and article.content:
+            raise ValueError('Article content is not lazily loaded.')
+
+    def __getstate__(self):
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        # Date given to an article without one is given again, see Article.
+        if self._undated:
+            self.date = datetime.datetime.now()
+
+    def __lt__(self, other):
+        return self.sort_key < other.sort_key
+
+    @property
+    def sort_key(self):
+        return (self.date, self.id)
+
+    @property
+    def filename(self):
+        return self.path[:-len('.markdown')]
+
+    @property
+    def content(self):
+        '''Content is read from the source file each time it is needed.'''
+        if self._content_offset is None:
+            return ''
+        return read_content(self.path, self._content_offset)
+
+    def content_source(self):
+        if self._content_offset is None:
+            return None
+        return self.path, self._content_offset
+
+    @property
+    def jekyll_content(self):
+        return translate_to_jekyll_markdown(self.content)
+
+    def materialize(self, mod, mods):
+        '''Returns the full (editable) article.'''
+        return Article(mod, mods, self.path, lazy=True)
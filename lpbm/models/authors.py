@@ -57,7 +57,7 @@ class Author(cm_module.Model):
         self.nickname = ltools.input_default('Nickname', self.nickname,
                                              required=True, is_valid=is_valid)
         if self.nickname != old_nick:
-            self.mod.cm.config.remove_section(old_nick)
+            self.mod.cm.remove_section(old_nick)
 
     def jekyll_markdown_filename(self):
         return '%s.md' % self.nickname
@@ -72,16 +72,15 @@ class Category(cm_module.Model):
         self.name = ltools.input_default('Name', self.name, required=True,
                                          is_valid=is_valid)
         if self.name != old_name:
-            self.mod.cm.config.remove_section(old_name)
+            self.mod.cm.remove_section(old_name)
 
     def interactive_parent(self):
         self.mod.opt_list(short=True)
         super()._interactive_field('parent')
 
     def interactive_parent_is_valid(self, value):
-        ids = [obj.id for obj in self.mod.objects]
         try:
-            return value is None or int(value) in ids
+            return value is None or int(value) in self.mod
         except ValueError:
             return False
 
@@ -3,19 +3,22 @@
 # License: New BSD License (See LICENSE)
 
 '''
-This module dynamically loads all the command line modules in `modules`
-directory.
+This module loads all the command line modules in `modules` directory, from
+the COMMANDS table and, for modules not listed there, by looking for them.
 '''
 
 import abc
-import imp
-import inspect
+import argparse
+import functools
+import importlib
 import os
-import sys
+import time
 
+import lpbm.lib.scheduler
 import lpbm.logging
 import lpbm.tools as ltools
 from lpbm.lib.deprecated_command import deprecated_command
+from lpbm.lib.id_allocator import IdAllocator
 
 
 class Module(metaclass=abc.ABCMeta):
@@ -23,12 +26,19 @@ class Module(metaclass=abc.ABCMeta):
     This is the base class of all modules. You can find documentation for every
     method required. To create a new module, you just have to create an new
     file in modules directory, inheriting from this class, and implementing
-    following methods. It will then be loaded automatically.
+    following methods. It will then be loaded automatically. Modules shipped
+    with lpbm are also listed in COMMANDS, so that they are only imported when
+    needed.
     """
 
+    # Whether serve-daemon can keep the module loaded between commands, as
+    # long as the blog is not modified.
+    cacheable = False
+
     def __init__(self):
         self.parser, self.modules, self.args = None, None, None
         self.needed_modules, self.module_loaded = None, False
+        self.load_after, self.load_timings = None, None
 
     def module_init(self, argument_parser):
         """
@@ -41,25 +51,53 @@ class Module(metaclass=abc.ABCMeta):
         )
         self.parser.set_defaults(func=self.module_process)
         self.needed_modules = []
+        # Modules that must be loaded before this one is. Every module but
+        # configuration needs it, override this in init for other dependencies.
+        self.load_after = [] if self.name() == 'config' else ['config']
         self.init()
 
     def module_process(self, modules, args):
         """
         This methods calls the load function of each needed module and then
         calls the process function overriden by you. Configuration is always
-        loaded.
+        loaded. Needed modules are loaded concurrently, each one once the
+        modules in its load_after list are loaded, and the module itself is
+        loaded last. Timings of loads are kept in load_timings.
         """
-        modules['config'].module_load(modules, args)
-        for mod in self.needed_modules:
-            modules[mod].module_load(modules, args)
-        self.module_load(modules, args)
+        names, pending = [], ['config'] + list(self.needed_modules)
+        while pending:
+            name = pending.pop(0)
+            if name not in names:
+                names.append(name)
+                pending.extend(modules[name].load_after)
+        tasks = dict(
+            (name, functools.partial(modules[name].module_load, modules, args))
+            for name in names
+        )
+        dependencies = dict((name, modules[name].load_after) for name in names)
+        self.load_timings = lpbm.lib.scheduler.run_graph(tasks, dependencies)
+
+        # The module itself is loaded in the main thread, it may prompt user.
+        if self.name() not in self.load_timings:
+            start = time.perf_counter()
+            self.module_load(modules, args)
+            self.load_timings[self.name()] = (
+                max(sum(timing) for timing in self.load_timings.values()),
+                time.perf_counter() - start,
+            )
+
+        logger = lpbm.logging.get()
+        for name, (begin, duration) in sorted(self.load_timings.items(), key=lambda it: it[1]):
+            logger.debug('Module %s loaded in %.1fms (started at %.1fms).',
+                         name, duration * 1000, begin * 1000)
         self.process(modules, args)
 
     def module_load(self, modules, args):
+        # Modules kept loaded by serve-daemon still see arguments of each run.
+        self.modules, self.args = modules, args
         if self.module_loaded:
             return
-        self.modules, self.args = modules, args
-        self.module_loaded, self.args = True, args
+        self.module_loaded = True
         self.load(modules, args)
 
     @abc.abstractmethod
@@ -93,10 +131,42 @@ class Module(metaclass=abc.ABCMeta):
         pass
 
 
+class Index:
+    '''
+    Declares a secondary index of a model manager, on attribute attr of its
+    objects. If multiple is True, the attribute is a list of keys. key can be
+    given to transform the value of the attribute before indexing.
+    '''
+
+    def __init__(self, attr, multiple=False, key=None):
+        self.attr, self.multiple, self.key = attr, multiple, key
+
+    def keys(self, obj):
+        value = getattr(obj, self.attr)
+        values = value if self.multiple else [value]
+        if self.key is not None:
+            values = [self.key(v) for v in values]
+        return values
+
+
 class ModelManagerModule(Module, metaclass=abc.ABCMeta):
+    cacheable = True
+
+    # Secondary indexes maintained on objects, by name. See Index class.
+    indexes = dict()
+
+    # Files and directories (relative to the blog) objects are loaded from,
+    # and attributes of the module kept in snapshots. See module_load.
+    sources, snapshot_attrs = (), ()
+
     def __init__(self):
         super().__init__()
-        self._objects = dict()
+        self._objects, self._live, self._deleted = dict(), dict(), dict()
+        self._index_keys, self._lists = dict(), dict()
+        self._indexes = dict((name, dict()) for name in self.indexes)
+        self.ids = IdAllocator()
+        # Objects replaced by another one with the same id, by id.
+        self.duplicates = dict()
         self.fgroup, self.ggroup, self.igroup = None, None, None
         self.fopts, self.gopts, self.iopts = [], [], []
         self.helps = {
@@ -108,28 +178,162 @@ class ModelManagerModule(Module, metaclass=abc.ABCMeta):
             'with-deleted': 'include deleted {object_name_plural} in listings.',
         }
 
+    def module_load(self, modules, args):
+        '''
+        With the cache, objects are restored from the snapshot taken after the
+        last load when sources were not modified since, else they are loaded
+        and a new snapshot is taken.
+        '''
+        if self.module_loaded or not self.sources or not getattr(args, 'cache', False):
+            return super().module_load(modules, args)
+        # Only imported with the cache, not to import pickle on every run.
+        import lpbm.lib.snapshot as snapshot
+        import lpbm.models.configmodel as cm_module
+        if cm_module.active_store() is not None:
+            return super().module_load(modules, args)
+        filename = ltools.cache_path(args.exec_path, self.name() + '.snapshot')
+        fingerprint = snapshot.fingerprint(
+            ltools.join(args.exec_path), ('lpbm.cfg',) + self.sources,
+            getattr(args, 'compact', False))
+        state = snapshot.load(filename, fingerprint)
+        if state is not None:
+            self.modules, self.args, self.module_loaded = modules, args, True
+            self.restore(state)
+            return
+        super().module_load(modules, args)
+        snapshot.save(filename, fingerprint, self.snapshot())
+
+    # Attributes of the manager making its loaded state, see snapshot.
+    _STATE_ATTRS = ('_objects', '_live', '_deleted', '_index_keys', '_indexes', 'ids',
+                    'duplicates')
+
+    def snapshot(self):
+        '''Returns the state of the module once loaded, to be pickled.'''
+        return dict(
+            (name, getattr(self, name)) for name in self._STATE_ATTRS + self.snapshot_attrs
+        )
+
+    def restore(self, state):
+        '''
+        Sets the state of the module back from a snapshot. Objects and indexes
+        are taken as they are, objects only get their managers back.
+        '''
+        import lpbm.models.configmodel as cm_module
+        for name, value in state.items():
+            setattr(self, name, value)
+        duplicates = [obj for objs in self.duplicates.values() for obj in objs]
+        for obj in list(self._objects.values()) + duplicates:
+            if isinstance(obj, cm_module.Model):
+                obj.mod, obj.mods = self, self.modules
+        self._lists.clear()
+
     def __getitem__(self, id):
         try:
             return self._objects[id]
         except KeyError:
             raise lpbm.exceptions.ModelDoesNotExistError(self.object_name(), id)
 
+    def __contains__(self, id):
+        '''Tells if id is the id of an object, following the rules of objects.'''
+        if getattr(self.args, 'with_deleted', False):
+            return id in self._objects
+        return id in self._live
+
     def create_object(self, cls, *args, **kwargs):
         return cls(self, self.modules, *args, **kwargs)
 
     def register_object(self, cls, *args, **kwargs):
-        obj = self.create_object(cls, *args, **kwargs)
+        return self.add_object(self.create_object(cls, *args, **kwargs))
+
+    def add_object(self, obj, replace=False):
+        '''
+        Registers an already created object. When several objects share the
+        same id, the last one added wins, so callers creating objects in
+        parallel must add them in a stable order. Objects replaced are kept in
+        duplicates, unless replace is True.
+        '''
+        old = self._objects.get(obj.id)
+        if old is not None:
+            if not replace and old is not obj:
+                self.duplicates.setdefault(obj.id, []).append(old)
+            self._unindex(old)
         self._objects[obj.id] = obj
+        self.ids.add(obj.id)
+        self._index(obj)
         return obj
 
+    def reindex(self, obj):
+        '''
+        Updates live/deleted partitions and secondary indexes after fields of
+        obj were modified. Does nothing if obj is not registered.
+        '''
+        if self._objects.get(obj.id) is obj:
+            self._unindex(obj)
+            self._index(obj)
+
+    def _index(self, obj):
+        (self._deleted if obj.deleted else self._live)[obj.id] = obj
+        keys = dict((name, index.keys(obj)) for name, index in self.indexes.items())
+        for name, values in keys.items():
+            for value in values:
+                self._indexes[name].setdefault(value, dict())[obj.id] = obj
+        self._index_keys[obj.id] = keys
+        self._lists.clear()
+
+    def _unindex(self, obj):
+        self._live.pop(obj.id, None)
+        self._deleted.pop(obj.id, None)
+        for name, values in self._index_keys.pop(obj.id, dict()).items():
+            for value in values:
+                bucket = self._indexes[name].get(value, dict())
+                bucket.pop(obj.id, None)
+                if not bucket:
+                    self._indexes[name].pop(value, None)
+        self._lists.clear()
+
+    def lookup(self, **criteria):
+        '''
+        Returns objects (following the same rules as objects property)
+        matching all the criteria, given as index_name=value, using secondary
+        indexes. Example: lookup(author=3, published=True).
+        '''
+        buckets = sorted(
+            (self._indexes[name].get(value, dict()) for name, value in criteria.items()),
+            key=len,
+        )
+        if not buckets:
+            return self.objects
+        with_deleted = getattr(self.args, 'with_deleted', False)
+        return tuple(
+            obj for id, obj in buckets[0].items()
+            if (with_deleted or id in self._live) and all(id in b for b in buckets[1:])
+        )
+
+    def save_objects(self, objects=None):
+        '''
+        Saves objects (all of them by default) in one pass: each modified
+        configuration file is written once, even if shared by several objects.
+        '''
+        import lpbm.models.configmodel as cm_module
+        with cm_module.batch_save():
+            for obj in (self.all_objects if objects is None else objects):
+                obj.save()
+
     @property
     def objects(self):
-        return [obj for obj in self._objects.values()
-                if getattr(self.args, 'with_deleted', False) or not obj.deleted]
+        '''Live objects (or all of them with --with-deleted), not to be modified.'''
+        if getattr(self.args, 'with_deleted', False):
+            return self.all_objects
+        if 'live' not in self._lists:
+            self._lists['live'] = tuple(self._live.values())
+        return self._lists['live']
 
     @property
     def all_objects(self):
-        return list(self._objects.values())
+        '''All the objects, including deleted ones, not to be modified.'''
+        if 'all' not in self._lists:
+            self._lists['all'] = tuple(self._objects.values())
+        return self._lists['all']
 
     def init(self):
         # Set correctly object name to its value.
@@ -228,7 +432,7 @@ class ModelManagerModule(Module, metaclass=abc.ABCMeta):
 
     def is_valid(self, id):
         try:
-            if int(id) not in self._objects:
+            if int(id) not in self.ids:
                 print('{} id {} is invalid!'.format(self.object_name().title(), id))
                 return False
         except ValueError:
@@ -244,48 +448,101 @@ class ModelManagerModule(Module, metaclass=abc.ABCMeta):
         return True
 
 
-def load_modules(modules_, argument_parser):
-    """Dynamically loads all the compatible commands from modules directory"""
+# Commands shipped with lpbm, by name: module and class implementing them, and
+# their abstract (the same as the one of the class). Commands not run are not
+# imported, they only appear in help with their abstract.
+COMMANDS = {
+    'articles': ('lpbm.modules.articles', 'Articles', 'Loads and manipulates articles.'),
+    'authors': ('lpbm.modules.authors', 'Authors', 'Loads, manipulates and renders authors.'),
+    'categories': ('lpbm.modules.categories', 'Categories', 'Loads and manipulates categories.'),
+    'check': ('lpbm.modules.check', 'Check',
+              'Checks references between articles, authors and categories.'),
+    'config': ('lpbm.modules.config', 'Config', 'Manipulates blog configuration.'),
+    'migrate': ('lpbm.modules.migrate', 'Migrate', 'Migrate blog to jekyll configuration'),
+    'render': ('lpbm.modules.render', 'Render', 'Blog generation module.'),
+    'serve-daemon': ('lpbm.modules.serve_daemon', 'ServeDaemon',
+                     'Keeps the blog loaded and runs commands sent with --client.'),
+    'store': ('lpbm.modules.store', 'Store',
+              'Converts models between ini files and SQLite store.'),
+}
+
+
+def _init_module(modules_, argument_parser, cls):
+    logger = lpbm.logging.get()
+    try:
+        tmp = cls()
+        tmp.module_init(argument_parser)
+    except TypeError as e:
+        msg = 'Failed to instanciate class %s, abstract method or property missing?'
+        logger.debug(msg, cls.__name__)
+        logger.debug('    Error: ' + str(e))
+        return
+    logger.info('Command %s was correctly loaded.', tmp.name())
+    modules_[tmp.name()] = tmp
+
+
+class LazyModules(dict):
+    '''
+    Modules by command name. Modules listed in COMMANDS are imported and
+    initialized the first time they are needed, with a parser of their own
+    that is never used for parsing.
+    '''
+
+    def __missing__(self, name):
+        if name not in COMMANDS:
+            raise KeyError(name)
+        parser = argparse.ArgumentParser(add_help=False).add_subparsers()
+        self.load(name, parser)
+        if name not in self:
+            raise KeyError(name)
+        return dict.__getitem__(self, name)
+
+    def load(self, name, argument_parser):
+        '''Imports module of command name and adds its parser to argument_parser.'''
+        mod_name, cls_name, _ = COMMANDS[name]
+        _init_module(self, argument_parser, getattr(importlib.import_module(mod_name), cls_name))
+
+
+def discover_modules():
+    '''
+    Finds modules of the modules directory that are not in COMMANDS (added by
+    a third party for example), and returns Module classes defined in them.
+    '''
+    logger, known = lpbm.logging.get(), set(command[0] for command in COMMANDS.values())
     main_root = os.path.join(os.path.dirname(__file__), 'modules')
-    logger, modules = lpbm.logging.get(), []
-
-    # Finds all submodules that should be loaded.
-    logger.debug('Tool being loaded from %s.', main_root)
-    for root, _, files in os.walk(main_root):
-        root_ = root[len(main_root):]
-        for filename in files:
-            if not filename.endswith('.py'):
-                continue
-            mod_name = root_.replace('/', '.') + filename[:-3]
-            try:
-                modules.append((
-                    mod_name, imp.find_module(mod_name, [root] + sys.path)
-                ))
-                logger.debug('Module found: lpbm.tools.%s', mod_name)
-            except ImportError:
-                logger.debug('Failed to find module %s.', mod_name)
-
-    modules = sorted(modules, key=lambda mod: mod[0])
-
-    # Loads modules 1 by 1.
-    for mod_name, (fd, pathname, description) in modules:
+    res = []
+    for filename in sorted(os.listdir(main_root)):
+        if not filename.endswith('.py') or filename.startswith('_'):
+            continue
+        mod_name = 'lpbm.modules.' + filename[:-3]
+        if mod_name in known:
+            continue
         try:
-            mod = imp.load_module(mod_name, fd, pathname, description)
-            logger.debug('Module loaded: %s', mod.__name__)
-            for item in inspect.getmembers(mod):
-                logger.debug(' + Item in module found: %s', item[0])
-                if inspect.isclass(item[1]) and issubclass(item[1], Module):
-                    try:
-                        logger.debug('  -> Item is a subclass of Module class.')
-                        tmp = item[1]()
-                        tmp.module_init(argument_parser)
-                        msg = 'Command %s was correctly loaded.'
-                        logger.info(msg, tmp.name())
-                        modules_[tmp.name()] = tmp
-                    except TypeError as e:
-                        msg = '  -> Failed to instanciate class %s, abstract '
-                        msg += 'method or property missing?'
-                        logger.debug(msg, item[0])
-                        logger.debug('    Error: ' + str(e))
+            mod = importlib.import_module(mod_name)
         except ImportError as err:
             logger.debug('Failed to import module %s (%s).', mod_name, err)
+            continue
+        logger.debug('Module discovered: %s', mod_name)
+        for item in vars(mod).values():
+            if (isinstance(item, type) and issubclass(item, Module) and
+                    item.__module__ == mod_name):
+                res.append(item)
+    return res
+
+
+def load_modules(modules_, argument_parser, command=None, discover=True):
+    '''
+    Adds all the commands to argument_parser. Only the module of command is
+    imported and its parser built, other commands listed in COMMANDS only show
+    their abstract and are imported by modules_ (a LazyModules) if needed.
+    Unless command is in COMMANDS, modules found with discover_modules are
+    loaded too if discover is True.
+    '''
+    for name, (_, _, abstract) in sorted(COMMANDS.items()):
+        if name == command:
+            modules_.load(name, argument_parser)
+        else:
+            argument_parser.add_parser(name, help=abstract, description=abstract)
+    if discover and command not in COMMANDS:
+        for cls in discover_modules():
+            _init_module(modules_, argument_parser, cls)
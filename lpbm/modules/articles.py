@@ -9,10 +9,12 @@ pair of two files. One is a markdown file, the other one an ini file.
 
 import lpbm.exceptions
 import lpbm.logging
+import lpbm.models.configmodel as cm_module
 import lpbm.module_loader
 import lpbm.tools as ltools
 from lpbm.lib.deprecated_command import deprecated_command
-from lpbm.models.articles import Article
+from lpbm.lib.file_index import FileIndex, file_stamp
+from lpbm.models.articles import Article, CompactArticle
 
 _LOGGER = lpbm.logging.get()
 
@@ -23,6 +25,15 @@ class Articles(lpbm.module_loader.ModelManagerModule):
     pair of two files. One is a markdown file, the other one an ini file.
     '''
 
+    indexes = {
+        'author': lpbm.module_loader.Index('authors', multiple=True),
+        'category': lpbm.module_loader.Index('categories', multiple=True),
+        'published': lpbm.module_loader.Index('published'),
+        'date': lpbm.module_loader.Index('date', key=lambda date: date.date()),
+    }
+
+    sources = ('articles',)
+
     def abstract(self): return 'Loads and manipulates articles.'
 
     def model_cls(self): return Article
@@ -43,8 +54,62 @@ class Articles(lpbm.module_loader.ModelManagerModule):
         def filter_fn(a):
             return a.endswith('.markdown')
 
-        for root, filename in ltools.filter_files(filter_fn, self.args.exec_path, 'articles'):
-            self.register_object(Article, ltools.join(root, filename))
+        # Paths are sorted so that objects are registered in the same order
+        # whatever the number of jobs used to read them.
+        root = ltools.join(args.exec_path, 'articles')
+        filenames = sorted(filename for _, filename in ltools.filter_files(filter_fn, root))
+
+        # With the cache, metadata of articles not modified since last run is
+        # taken from the index instead of parsing their files.
+        index = None
+        if getattr(args, 'cache', False):
+            index = FileIndex(ltools.cache_path(args.exec_path, 'articles.idx'))
+
+        # Configuration of articles lives in the store when one is used.
+        store = cm_module.active_store()
+
+        # Articles' content is only read when needed (rendering for example).
+        def read_fn(filename):
+            path = ltools.join(root, filename)
+            if index is None:
+                return self.create_object(Article, path, lazy=True)
+            config = store.path if store is not None else path[:-len('.markdown')] + '.cfg'
+            stamp = file_stamp(path, config)
+            metadata = index.get(filename, stamp)
+            if metadata is not None:
+                return self.create_object(Article, path, metadata=metadata)
+            article = self.create_object(Article, path, lazy=True, keep_config=True)
+            index.set(filename, stamp, article.metadata())
+            return article
+
+        # In compact mode, only a read-only representation of articles is kept.
+        def create_fn(filename):
+            article = read_fn(filename)
+            return CompactArticle(article) if getattr(args, 'compact', False) else article
+
+        for article in ltools.parallel_map(create_fn, filenames, getattr(args, 'jobs', 1)):
+            self.add_object(article)
+
+        if index is not None:
+            index.prune(filenames)
+            index.save()
+
+    def restore(self, state):
+        '''Articles without a date were given a new one, they are reindexed.'''
+        super().restore(state)
+        for article in self.all_objects:
+            if article._undated:
+                self.reindex(article)
+
+    def materialize(self, id):
+        '''
+        Returns the full article for this id, replacing its compact
+        representation if articles were loaded in compact mode.
+        '''
+        article = self[id]
+        if isinstance(article, CompactArticle):
+            article = self.add_object(article.materialize(self, self.modules), replace=True)
+        return article
 
     def _get_author_verbose(self, authors):
         res = []
@@ -21,6 +21,9 @@ class Authors(lpbm.module_loader.ModelManagerModule):
     all the authors.
     '''
 
+    sources = ('authors.cfg',)
+    snapshot_attrs = ('cm',)
+
     def abstract(self): return 'Loads, manipulates and renders authors.'
 
     def model_cls(self): return Author
@@ -20,6 +20,9 @@ class Categories(lpbm.module_loader.ModelManagerModule):
     loading all the categories.
     '''
 
+    sources = ('categories.cfg',)
+    snapshot_attrs = ('cm',)
+
     def abstract(self): return 'Loads and manipulates categories.'
 
     def name(self): return 'categories'
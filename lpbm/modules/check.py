@@ -0,0 +1,118 @@
+# lpbm/modules/check.py - Checks references between models.
+# Author: Franck Michea < franck.michea@gmail.com >
+# License: New BSD License (See LICENSE)
+
+'''
+Checks the whole blog at once: authors and categories of articles, parents of
+categories (including cycles) and ids shared by several objects. Every problem
+found is reported, and the command fails if there is at least one, so that it
+can be used in hooks.
+'''
+
+import os
+import sys
+
+import lpbm.module_loader
+import lpbm.tools as ltools
+
+
+class Check(lpbm.module_loader.Module):
+    '''
+    Checks references between articles, authors and categories, reporting
+    every problem found in one pass.
+    '''
+
+    def name(self): return 'check'
+
+    def abstract(self): return 'Checks references between articles, authors and categories.'
+
+    def init(self):
+        self.needed_modules = ['authors', 'categories', 'articles']
+
+    def process(self, modules, args):
+        problems = self.check(modules, args)
+        for problem in problems:
+            print(problem)
+        if problems:
+            sys.exit('{} problem(s) found.'.format(len(problems)))
+        print('No problem found.')
+
+    def check(self, modules, args):
+        '''Returns the list of all problems found, as messages.'''
+        root, problems = ltools.join(args.exec_path), []
+
+        def describe(obj):
+            path = getattr(obj, 'path', None)
+            if path is not None:
+                return os.path.relpath(path, root)
+            return getattr(obj, 'nickname', None) or getattr(obj, 'name', None)
+
+        # Objects replaced by another one with the same id are checked too.
+        def every(mod):
+            res = list(mod.all_objects)
+            for objs in mod.duplicates.values():
+                res.extend(objs)
+            return res
+
+        # Ids of live and deleted objects of each kind.
+        ids = dict()
+        for name in ['authors', 'categories', 'articles']:
+            mod = modules[name]
+            live, deleted = set(), set()
+            for obj in mod.all_objects:
+                (deleted if obj.deleted else live).add(obj.id)
+            ids[name] = (live, deleted)
+
+            for obj in every(mod):
+                if obj.id is None:
+                    problems.append('{} {} has no id.'.format(
+                        mod.object_name(), describe(obj)))
+            for id, objs in sorted(mod.duplicates.items(), key=lambda item: str(item[0])):
+                if id is None:
+                    continue
+                names = ', '.join(describe(obj) for obj in objs + [mod[id]])
+                problems.append('{} id {} is shared by: {}.'.format(
+                    mod.object_name(), id, names))
+
+        def check_reference(owner, obj, kind, id, what=None):
+            live, deleted = ids[kind]
+            if id in live:
+                return
+            problems.append('{} {} references {} {} {}.'.format(
+                modules[owner].object_name(), describe(obj),
+                'deleted' if id in deleted else 'unknown',
+                what or modules[kind].object_name(), id,
+            ))
+
+        # References of live articles.
+        for article in every(modules['articles']):
+            if article.deleted:
+                continue
+            for id in sorted(article.authors):
+                check_reference('articles', article, 'authors', id)
+            for id in sorted(article.categories):
+                check_reference('articles', article, 'categories', id)
+
+        # Parents of live categories, then cycles in parent chains.
+        categories = modules['categories']
+        parents = dict((cat.id, cat.parent) for cat in categories.all_objects)
+        for cat in every(categories):
+            if not cat.deleted and cat.parent is not None:
+                check_reference('categories', cat, 'categories', cat.parent, 'parent')
+
+        # Each category is visited once: False while in the current chain, True
+        # when its chain is known to be without cycle.
+        visited = dict()
+        for cat in categories.all_objects:
+            chain, id = [], cat.id
+            while id is not None and id not in visited and id in parents:
+                visited[id] = False
+                chain.append(id)
+                id = parents[id]
+            if id is not None and visited.get(id) is False:
+                cycle = chain[chain.index(id):] + [id]
+                problems.append('categories form a cycle: {}.'.format(
+                    ' > '.join(describe(categories[id]) for id in cycle)))
+            for id in chain:
+                visited[id] = True
+        return problems
@@ -12,6 +12,7 @@ import os
 import sys
 
 import lpbm.logging
+import lpbm.models.configmodel as cm_module
 import lpbm.module_loader
 import lpbm.tools as ltools
 from lpbm.lib.deprecated_command import deprecated_command
@@ -40,6 +41,10 @@ _CONFIGURATION = {
         'twitter_id': (False, 'Twitter id, for the mention (ex: kushou_)'),
         'disqus_id': (False, 'Disqus id for comments in articles.'),
     }),
+    'store': (False, {
+        'backend': (False, 'Where models are kept: files (default) or sqlite.'),
+        'path': (False, 'Path of the SQLite store (default: lpbm.sqlite).'),
+    }),
     'logging-std': (False, {
         'level': (False, 'Level of messages logged on stderr.'),
     }),
@@ -52,6 +57,8 @@ class Config(lpbm.module_loader.Module):
     have to change the file by hand.
     '''
 
+    cacheable = True
+
     def name(self): return 'config'
 
     def abstract(self): return 'Manipulates blog configuration.'
@@ -110,6 +117,18 @@ class Config(lpbm.module_loader.Module):
             logging_conf.update({'logging-std': {'level': 'DEBUG'}})
         lpbm.logging.configure(logging_conf)
 
+        # Models can be kept in a SQLite store instead of ini files.
+        store = None
+        if self.config.get('store', 'backend', fallback='files') == 'sqlite':
+            import lpbm.lib.sqlitestore as sqlitestore
+            store = sqlitestore.Store(self.store_path(args), args.exec_path)
+        cm_module.use_store(store)
+
+    def store_path(self, args):
+        '''Returns the path of the SQLite store of the blog.'''
+        path = self.config.get('store', 'path', fallback='lpbm.sqlite')
+        return ltools.join(args.exec_path, path)
+
     # Access to the configuration safely.
     def __getitem__(self, name):
         try:
@@ -1,23 +1,75 @@
 import codecs
+import concurrent.futures
 import datetime
+import hashlib
+import json
+import operator
 import os
 import shutil
 import sys
 import tempfile
-
-import jinja2
-import PyRSS2Gen
+import time
 
 import lpbm
+import lpbm.lib.filesync as filesync
 import lpbm.tools as ltools
+from lpbm.lib.build_manifest import MANIFEST_NAME, BuildManifest, hash_file
+from lpbm.lib.file_index import file_stamp
+from lpbm.models.articles import read_content, translate_to_jekyll_markdown
 
 _ENV = None
 
+# Values of article payloads used by the template, content aside.
+_ARTICLE_METADATA = ('title', 'authors', 'categories', 'html_filename')
+
+# Template of articles in worker processes, see _init_worker.
+_ARTICLE_TEMPLATE = None
+
 
 def _get_template(*args):
     return _ENV.get_template(os.path.join(*args))
 
 
+def _make_env(root):
+    import jinja2
+    return jinja2.Environment(loader=jinja2.FileSystemLoader(ltools.join(root, 'templates')))
+
+
+def _render_article(template, payload):
+    '''
+    Renders an article from its payload (see Migrate._article_payload), which
+    only holds plain values so that it can be sent to another process.
+    '''
+    content = payload['content']
+    if content is None:
+        content = read_content(*payload['source'])
+    article = dict(payload, jekyll_content=translate_to_jekyll_markdown(content))
+    with open(payload['path'], 'w', encoding='utf-8', newline='') as f:
+        f.write(template.render({
+            'article': article,
+        }))
+
+
+def _same_content(source, target):
+    '''Tells if target exists with the same content as source.'''
+    try:
+        if os.path.getsize(source) != os.path.getsize(target):
+            return False
+    except OSError:
+        return False
+    return hash_file(source) == hash_file(target)
+
+
+def _init_worker(root):
+    '''Each worker process has its own jinja2 environment.'''
+    global _ARTICLE_TEMPLATE
+    _ARTICLE_TEMPLATE = _make_env(root).get_template('articles.md')
+
+
+def _render_article_in_worker(payload):
+    _render_article(_ARTICLE_TEMPLATE, payload)
+
+
 class Migrate(lpbm.module_loader.Module):
     def name(self): return 'migrate'
 
@@ -32,20 +84,43 @@ class Migrate(lpbm.module_loader.Module):
         noconfirm_help = 'do not confirm to empty output directory.'
         self.parser.add_argument('-N', '--noconfirm', action='store_true',
                                  default=False, help=noconfirm_help)
+        strategy_help = (
+            'how output directory is updated: replace empties it and moves every file, sync '
+            'only writes files that changed, swap builds a new directory next to it and '
+            'switches the output symbolic link to it. With sync, files not generated by lpbm '
+            'are kept once a migration was done there. (default: %(default)s)'
+        )
+        self.parser.add_argument('-S', '--output-strategy', action='store',
+                                 choices=['replace', 'sync', 'swap'], default='replace',
+                                 help=strategy_help)
 
     def load(self, modules, args):
-        self.build_dir = tempfile.mkdtemp(prefix='lpbm_jekyll_')
-
         if args.output is not None:
-            self.output_dir = ltools.abspath(args.output)
+            self.output_path = ltools.abspath(args.output)
         else:
-            self.output_dir = ltools.join(args.exec_path, 'result-jekyll')
+            self.output_path = os.path.join(ltools.join(args.exec_path), 'result-jekyll')
+        self.output_dir = os.path.realpath(self.output_path)
+        self.strategy = getattr(args, 'output_strategy', 'replace')
 
         if not os.path.exists(self.output_dir):
             msg = 'I didn\'t find directory/symbolic link named `{path}`'
             msg += ' where to put the blog\'s new sources. Please create it.'
             sys.exit(msg.format(path=self.output_dir))
 
+        # With swap, the new release is built where it will stay, next to the
+        # previous ones.
+        if self.strategy == 'swap':
+            if not os.path.islink(self.output_path) and os.listdir(self.output_path):
+                sys.exit('Output `{path}` must be a symbolic link (or an empty directory) to '
+                         'be swapped.'.format(path=self.output_path))
+            releases = self._releases_dir()
+            ltools.mkdir_p(releases)
+            prefix = time.strftime('%Y%m%d%H%M%S-')
+            self.build_dir = tempfile.mkdtemp(prefix=prefix, dir=releases)
+            os.chmod(self.build_dir, 0o755)
+        else:
+            self.build_dir = tempfile.mkdtemp(prefix='lpbm_jekyll_')
+
         msg = '''\
 By converting your LPBM blog to Jekyll, you understand that the result will look different and some
 features will be unavailable. There is also no guarantee that all links will redirect properly,
@@ -75,7 +150,7 @@ contents of the result directory. You now have a Jekyll blog!
 
         if not args.noconfirm:
             msg = 'Are you sure you want to convert your blog in `{path}`?\n'
-            msg += 'This action will remove all its contents!'
+            msg += self._confirm_warning()
             if not ltools.ask_sure(prompt=msg.format(path=self.output_dir)):
                 sys.exit('Nothing was done.')
 
@@ -92,17 +167,30 @@ contents of the result directory. You now have a Jekyll blog!
 
         self.root = ltools.join(ltools.ROOT, 'themes', 'jekyll')
 
-        # Jinja2 Environment Globals
+        # Files generated by the previous migration, to only write what changed.
+        # Replacing output directory generates everything again.
+        self.manifest = BuildManifest(self.output_dir)
+        if self.strategy == 'replace':
+            self.manifest.old = None
+
+        # Jinja2 Environment Globals. Jinja2 is only imported when migrating.
         global _ENV
-        _ENV = jinja2.Environment(loader=jinja2.FileSystemLoader(
-            ltools.join(self.root, 'templates')
-        ))
+        _ENV = _make_env(self.root)
         _ENV.globals.update({
             'authors_mod': self.modules['authors'],
             'categories_mod': self.modules['categories'],
             'config_mod': self.modules['config'],
         })
 
+    def _confirm_warning(self):
+        '''Tells what will be lost in output directory, with the output strategy.'''
+        if self.strategy == 'swap':
+            return 'Output will link to a new directory, only the previous one will be kept.'
+        if self.strategy == 'sync' and os.path.exists(
+                os.path.join(self.output_dir, MANIFEST_NAME)):
+            return 'Files generated by the previous migration will be replaced or removed.'
+        return 'This action will remove all its contents!'
+
     def process(self, modules, args):
         try:
             self.copy_base_structure()
@@ -119,25 +207,72 @@ contents of the result directory. You now have a Jekyll blog!
             # temporary directory to the output directory.
             self._copy_all()
         finally:
-            shutil.rmtree(self.build_dir)
+            if self.build_dir is not None:
+                shutil.rmtree(self.build_dir)
 
     def copy_base_structure(self):
         ltools.copy_content(ltools.join(self.root, 'base'), self.build_dir)
 
     def render_articles(self):
-        template = _get_template('articles.md')
-
         articles_by_category = {
             '_posts': self._get_articles(False),
             '_drafts': self._get_articles(True),
         }
-        for dirname, articles in articles_by_category.items():
-            for article in articles:
-                path = self._build_path(dirname, article.jekyll_markdown_filename())
-                with codecs.open(path, 'w', 'utf-8') as f:
-                    f.write(template.render({
-                        'article': article,
-                    }))
+        payloads = [
+            self._article_payload(dirname, article)
+            for dirname, articles in articles_by_category.items()
+            for article in articles
+        ]
+
+        # Articles whose inputs didn't change since last migration are kept.
+        build_dir = ltools.join(self.build_dir)
+        template_key = hash_file(ltools.join(self.root, 'templates', 'articles.md'))
+        payloads = [
+            payload for payload in payloads
+            if not self.manifest.is_fresh(os.path.relpath(payload['path'], build_dir),
+                                          self._article_key(template_key, payload))
+        ]
+
+        # With several jobs, articles are rendered by a pool of processes,
+        # largest first so that the pool is not left waiting for a big one.
+        jobs = getattr(self.args, 'jobs', 1) or 1
+        if jobs <= 1 or len(payloads) <= 1:
+            template = _get_template('articles.md')
+            for payload in payloads:
+                _render_article(template, payload)
+            return
+        payloads.sort(key=operator.itemgetter('size'), reverse=True)
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=jobs, initializer=_init_worker, initargs=(self.root,)) as pool:
+            for _ in pool.map(_render_article_in_worker, payloads):
+                pass
+
+    def _article_payload(self, dirname, article):
+        '''Returns what is needed to render article, as plain values.'''
+        authors, categories = self.modules['authors'], self.modules['categories']
+        source = article.content_source()
+        content = article.content if source is None else None
+        return {
+            'path': self._build_path(dirname, article.jekyll_markdown_filename()),
+            'title': article.title,
+            'authors': [authors[id].nickname for id in sorted(article.authors)],
+            'categories': [categories[id].full_name() for id in sorted(article.categories)],
+            'html_filename': article.html_filename(),
+            'source': source,
+            'content': content,
+            'size': len(content) if source is None else os.path.getsize(source[0]) - source[1],
+        }
+
+    def _article_key(self, template_key, payload):
+        '''Returns the hash of everything the rendering of payload depends on.'''
+        digest = hashlib.sha1(template_key.encode('ascii'))
+        metadata = dict((key, payload[key]) for key in _ARTICLE_METADATA)
+        digest.update(json.dumps(metadata, sort_keys=True).encode('utf-8'))
+        if payload['source'] is None:
+            digest.update(payload['content'].encode('utf-8'))
+        else:
+            digest.update(hash_file(*payload['source']).encode('ascii'))
+        return digest.hexdigest()
 
     def render_authors(self):
         template = _get_template('authors.md')
@@ -157,6 +292,8 @@ contents of the result directory. You now have a Jekyll blog!
             }))
 
     def render_rss(self):
+        import PyRSS2Gen
+
         link = '{base_url}/feed.xml'.format(
             base_url=self.modules['config']['general.url'].rstrip('/'),
         )
@@ -186,13 +323,50 @@ contents of the result directory. You now have a Jekyll blog!
             rss.write_xml(f, encoding='utf-8')
 
     def copy_media_files(self):
+        '''
+        Lists media files. They are not copied to the build directory but
+        synchronized with the output by _sync_medias, not to copy them twice.
+        '''
         source = ltools.join(self.args.exec_path, 'medias')
-        target = ltools.join(self.build_dir, 'medias')
+        self.medias = []
 
         if not os.path.exists(source):
             return
 
-        ltools.copy_content(source, target)
+        # Medias are identified by their stamp, not to read them all.
+        for _, filename in ltools.filter_files(lambda _: True, source):
+            path, relpath = os.path.join(source, filename), os.path.join('medias', filename)
+            self.manifest.new[relpath] = repr(file_stamp(path))
+            self.medias.append((path, relpath))
+
+    def _sync_medias(self, root, previous=None):
+        '''
+        Places media files in root. Files with the same stamp as their source
+        in root are skipped, or hard linked from the previous directory when
+        given. Others (new, modified or damaged) are hard linked or copied from
+        the blog, see lpbm.lib.filesync.
+        '''
+        if not self.medias:
+            return
+        todo, skipped = [], 0
+        for source, relpath in self.medias:
+            target = os.path.join(root, relpath)
+            kept = None if previous is None else os.path.join(previous, relpath)
+            if filesync.same_stamp(source, target):
+                skipped += os.path.getsize(source)
+            elif kept is not None and filesync.same_stamp(source, kept):
+                ltools.mkdir_p(os.path.dirname(target))
+                ltools.link_or_copy(kept, target)
+                skipped += os.path.getsize(source)
+            else:
+                todo.append((source, target))
+        placed = filesync.place_all(todo, getattr(self.args, 'jobs', 1) or 1)
+        print('Medias: {} copied, {} avoided ({} linked, {} unchanged).'.format(
+            filesync.format_size(placed[filesync.COPIED]),
+            filesync.format_size(placed[filesync.LINKED] + skipped),
+            filesync.format_size(placed[filesync.LINKED]),
+            filesync.format_size(skipped),
+        ))
 
     def render_config(self):
         path = self._build_path('_config.yml')
@@ -206,13 +380,105 @@ contents of the result directory. You now have a Jekyll blog!
         return ltools.join(self.build_dir, *args)
 
     def _copy_all(self):
-        # First big clean up of all the files.
+        '''
+        Updates the output directory with generated files, following the
+        output strategy. The manifest of generated files is written there.
+        '''
+        getattr(self, '_output_' + self.strategy)()
+
+    def _generated_files(self):
+        '''
+        Yields path of generated files relative to build directory, with the
+        key of each one in the manifest.
+        '''
+        for _, relpath in ltools.filter_files(lambda _: True, self.build_dir):
+            yield relpath, (self.manifest.new.get(relpath) or
+                            hash_file(os.path.join(self.build_dir, relpath)))
+
+    def _output_replace(self):
+        manifest = self.manifest
+        manifest.invalidate()
+        for relpath, key in self._generated_files():
+            manifest.new[relpath] = key
         ltools.empty_directory(self.output_dir)
         ltools.move_content(self.build_dir, self.output_dir)
+        self._sync_medias(self.output_dir)
+        manifest.save()
+
+    def _output_sync(self):
+        '''
+        Files made from the same inputs as the ones already there, or with the
+        same content, are kept as they are (with their inode and time). Files
+        generated by the previous migration but not by this one are removed,
+        or every other file without the manifest of the previous migration.
+        '''
+        manifest = self.manifest
+        manifest.invalidate()
+        for relpath, key in self._generated_files():
+            source = os.path.join(self.build_dir, relpath)
+            target = os.path.join(self.output_dir, relpath)
+            if manifest.is_fresh(relpath, key) or _same_content(source, target):
+                continue
+            ltools.mkdir_p(os.path.dirname(target))
+            shutil.move(source, target)
+        self._sync_medias(self.output_dir)
+
+        if manifest.old is not None:
+            orphans = manifest.orphans()
+        else:
+            orphans = [relpath for _, relpath in ltools.filter_files(
+                lambda _: True, self.output_dir) if relpath not in manifest.new]
+        for relpath in orphans:
+            ltools.remove_file(self.output_dir, relpath)
+        manifest.save()
+
+    def _output_swap(self):
+        '''
+        Build directory becomes the new release. Files that didn't change since
+        the previous migration are hard linked from the current release, then
+        the output symbolic link is replaced atomically. Only the previous
+        release is kept with the new one.
+        '''
+        release, manifest = self.build_dir, self.manifest
+        for relpath, key in list(self._generated_files()):
+            if manifest.is_fresh(relpath, key):
+                os.unlink(os.path.join(release, relpath))
+            manifest.new[relpath] = key
+        self._sync_medias(release, self.output_dir)
+        for relpath in manifest.new:
+            target = os.path.join(release, relpath)
+            if not os.path.exists(target):
+                ltools.mkdir_p(os.path.dirname(target))
+                ltools.link_or_copy(os.path.join(self.output_dir, relpath), target)
+        manifest.save(release)
+
+        previous = self.output_dir if os.path.islink(self.output_path) else None
+        if previous is None:
+            os.rmdir(self.output_path)
+        link = os.path.join(os.path.dirname(self.output_path),
+                            '.{}.tmp'.format(os.path.basename(self.output_path)))
+        ltools.remove_file(os.path.dirname(link), os.path.basename(link))
+        os.symlink(release, link)
+        os.replace(link, self.output_path)
+        self.build_dir = None
+
+        releases, kept = self._releases_dir(), (os.path.realpath(release), previous)
+        for name in os.listdir(releases):
+            path = os.path.join(releases, name)
+            if os.path.realpath(path) not in kept:
+                shutil.rmtree(path)
+
+    def _releases_dir(self):
+        '''
+        Each output has its own releases directory, next to it, so that outputs
+        sharing a directory never remove releases of each other.
+        '''
+        return os.path.join(os.path.dirname(self.output_path), '.lpbm-releases',
+                            os.path.basename(self.output_path))
 
     def _get_articles(self, drafts, limit=None, filter=None):
-        articles = sorted(self.modules['articles'].objects)
-        articles = [a for a in articles if a.published == (not drafts)]
+        articles = self.modules['articles'].lookup(published=not drafts)
+        articles = sorted(articles, key=operator.attrgetter('sort_key'))
 
         if filter is not None:
             articles = [a for a in articles if filter(a)]
@@ -0,0 +1,168 @@
+# lpbm/modules/serve_daemon.py - Keeps the blog loaded between commands.
+# Author: Franck Michea < franck.michea@gmail.com >
+# License: New BSD License (See LICENSE)
+
+'''
+Starts a daemon keeping the models of the blog loaded in memory, and running
+the commands sent to it with `lpbm --client <command>` on a Unix socket in the
+cache directory. Before each command, sources of the models kept loaded are
+checked for modifications and loaded again if needed. Commands are run one at
+a time, without standard input, so interactive commands can't be run through
+the daemon.
+'''
+
+import contextlib
+import io
+import os
+import sys
+import traceback
+
+import lpbm.lib.daemon as daemon
+import lpbm.lib.snapshot as snapshot
+import lpbm.main
+import lpbm.models.configmodel as cm_module
+import lpbm.module_loader
+import lpbm.tools as ltools
+
+
+def _exit_status(err):
+    '''Returns the exit status of SystemExit err, printing its message.'''
+    if err.code is None or isinstance(err.code, int):
+        return err.code or 0
+    print(err.code, file=sys.stderr)
+    return 1
+
+
+class ServeDaemon(lpbm.module_loader.Module):
+    '''
+    Keeps the blog loaded and runs commands sent with --client, loading the
+    blog again when it is modified.
+    '''
+
+    def name(self): return 'serve-daemon'
+
+    def abstract(self): return 'Keeps the blog loaded and runs commands sent with --client.'
+
+    def init(self):
+        self.needed_modules = ['authors', 'categories', 'articles']
+        self.parser.add_argument('-s', '--stop', action='store_true', default=False,
+                                 help='stop the daemon serving the blog.')
+        self.root, self.key, self.cache = None, None, dict()
+        self.sources = ()
+
+    def load(self, modules, args):
+        self.root = ltools.join(args.exec_path)
+
+    def process(self, modules, args):
+        path = daemon.socket_path(args.exec_path)
+        try:
+            daemon.request(path, {'stop': True} if args.stop else {})
+        except OSError:
+            if args.stop:
+                sys.exit('No daemon is serving this blog.')
+        else:
+            if not args.stop:
+                sys.exit('A daemon is already serving this blog.')
+            return
+
+        # Modules loaded to run this command are kept for the first one.
+        self._keep(modules)
+        self.key = self._key(args, self._stamp())
+
+        ltools.mkdir_p(os.path.dirname(path))
+        print('Serving {} on {}.'.format(self.root, path))
+        sys.stdout.flush()
+        try:
+            daemon.serve(path, self.handle)
+        except KeyboardInterrupt:
+            pass
+
+    def handle(self, data):
+        '''Answers a request of a client, see lpbm.lib.daemon.'''
+        if 'args' not in data:
+            return {'stdout': '', 'stderr': '', 'status': 0}, data.get('stop', False)
+        return self.run(data['args'], data.get('cwd', self.root)), False
+
+    def run(self, argv, cwd):
+        '''Runs the command in argv as if lpbm was run in cwd.'''
+        stdout, stderr = io.StringIO(), io.StringIO()
+        old_cwd, old_stdin = os.getcwd(), sys.stdin
+        sys.stdin = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+                try:
+                    os.chdir(cwd)
+                    self._run(argv)
+                    status = 0
+                except SystemExit as err:
+                    status = _exit_status(err)
+                except Exception:
+                    traceback.print_exc()
+                    status = 1
+        finally:
+            sys.stdin = old_stdin
+            os.chdir(old_cwd)
+        # Modules may be left half modified by a failed command.
+        if status:
+            self._clear()
+        return {'stdout': stdout.getvalue(), 'stderr': stderr.getvalue(), 'status': status}
+
+    def _run(self, argv):
+        stamp = self._stamp()
+        modules = lpbm.module_loader.LazyModules()
+        parser = lpbm.main.load_cmd_parser(argv, modules)
+        args = parser.parse_args(args=argv)
+        args.pdb = False
+
+        func = getattr(args, 'func', None)
+        if func is not None:
+            command = func.__self__
+            if command.name() == self.name():
+                sys.exit('ERROR: serve-daemon can\'t be run through the daemon.')
+            key = self._key(args, stamp)
+            if key != self.key:
+                self._clear()
+                self.key = key
+            if command.name() in self.cache:
+                self.cache[command.name()].parser = command.parser
+                func = self.cache[command.name()].module_process
+            modules.update(self.cache)
+
+        lpbm.main.run_command(parser, func, modules, args)
+        self._keep(modules)
+
+    def _key(self, args, stamp):
+        # Loaded modules depend on the blog and on the options changing loading.
+        return (stamp, args.cache, args.compact)
+
+    def _keep(self, modules):
+        for name, module in modules.items():
+            if module.cacheable and module.module_loaded:
+                self.cache[name] = module
+        # Sources are known once modules are loaded, modules kept were loaded
+        # from their current state.
+        sources = self._sources()
+        if sources != self.sources:
+            self.sources = sources
+            if self.key is not None:
+                self.key = (self._stamp(),) + self.key[1:]
+
+    def _sources(self):
+        '''
+        Returns files and directories of the blog modules kept are loaded from.
+        Others (medias, generated directories) don't change what is kept.
+        '''
+        sources = ['lpbm.cfg']
+        for module in self.cache.values():
+            sources.extend(getattr(module, 'sources', ()))
+        config = self.cache.get('config')
+        if config is not None and cm_module.active_store() is not None:
+            sources.append(os.path.relpath(config.store_path(config.args), self.root))
+        return sorted(set(sources))
+
+    def _stamp(self):
+        return snapshot.fingerprint(self.root, self.sources)
+
+    def _clear(self):
+        self.cache.clear()
+        cm_module.close_store()
@@ -0,0 +1,83 @@
+# lpbm/modules/store.py - Converts models between ini files and SQLite store.
+# Author: Franck Michea < franck.michea@gmail.com >
+# License: New BSD License (See LICENSE)
+
+'''
+Models (authors, categories and articles' metadata) are kept in ini files by
+default. They can instead be kept in a single SQLite store, enabled with
+`backend = sqlite` in section `store` of lpbm.cfg. This module imports ini
+files into the store and exports the store back to ini files.
+'''
+
+import configparser
+import os
+
+import lpbm.lib.sqlitestore as sqlitestore
+import lpbm.module_loader
+import lpbm.tools as ltools
+
+
+def _config_files(exec_path):
+    '''Yields all the configuration files of models in the blog.'''
+    for filename in ['authors.cfg', 'categories.cfg']:
+        path = ltools.join(exec_path, filename)
+        if os.path.exists(path):
+            yield path
+    for root, filename in ltools.filter_files(lambda f: f.endswith('.cfg'),
+                                              exec_path, 'articles'):
+        yield ltools.join(root, filename)
+
+
+class Store(lpbm.module_loader.Module):
+    '''
+    Imports ini files of models into the SQLite store, or exports the store
+    back to ini files.
+    '''
+
+    def name(self): return 'store'
+
+    def abstract(self): return 'Converts models between ini files and SQLite store.'
+
+    def init(self):
+        self.parser.add_argument('action', choices=['import', 'export'],
+                                 help='import ini files in store, or export them.')
+        self.parser.add_argument('-f', '--file', action='store', metavar='path',
+                                 help='path of the store (default: store.path option).')
+        output_help = 'directory where files are exported (default: blog directory).'
+        self.parser.add_argument('-o', '--output', action='store',
+                                 metavar='directory', help=output_help)
+
+    def process(self, modules, args):
+        path = args.file or modules['config'].store_path(args)
+        store = sqlitestore.Store(path, args.exec_path)
+        try:
+            if args.action == 'import':
+                self.import_files(store, args.exec_path)
+            else:
+                self.export_files(store, args.output or args.exec_path)
+        finally:
+            store.close()
+
+    def import_files(self, store, exec_path):
+        '''Replaces the content of store with configuration files of the blog.'''
+        files = dict()
+        for path in _config_files(exec_path):
+            config = configparser.ConfigParser(interpolation=None)
+            config.read(path, encoding='utf-8')
+            files[path] = dict(
+                (section, dict(config.items(section))) for section in config.sections()
+            )
+        store.save_files(files, replace=True)
+        print('{} files imported in {}.'.format(len(files), store.path))
+
+    def export_files(self, store, output):
+        '''Writes every file of store as an ini file in output.'''
+        filenames = store.files()
+        for filename in filenames:
+            config = sqlitestore.StoreConfigParser(store)
+            config.read(os.path.join(store.root, filename))
+            path = os.path.join(output, filename)
+            ltools.mkdir_p(os.path.dirname(path))
+            with ltools.atomic_write(path) as f:
+                config.write(f)
+        print('{} files exported to {}.'.format(len(filenames), output))
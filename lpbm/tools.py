@@ -4,12 +4,16 @@
 
 '''This module provides some tools needed almost everywhere in the code.'''
 
+import concurrent.futures
+import contextlib
 import os
 import re
 import shutil
 import sys
+import tempfile
 
 ROOT = os.path.dirname(__file__)
+CACHE_DIRNAME = '.lpbm-cache'
 
 
 def abspath(*args):
@@ -22,6 +26,11 @@ def join(*args):
     return os.path.realpath(os.path.join(*args))
 
 
+def cache_path(exec_path, *args):
+    '''Returns the path of a file in the cache directory of the blog.'''
+    return join(exec_path, CACHE_DIRNAME, *args)
+
+
 def filter_files(filter_fun, *path):
     '''Yields every filenames that match filter_fun in directories.'''
     root = join(*path)
@@ -32,6 +41,17 @@ def filter_files(filter_fun, *path):
                 yield (root, os.path.join(subroot[root_len + 1:], filename))
 
 
+def parallel_map(function, items, jobs=1):
+    '''
+    Calls function on every item with a pool of `jobs` threads. Results are
+    returned in the same order as items, whatever the order of completion.
+    '''
+    if jobs is None or jobs <= 1:
+        return [function(item) for item in items]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(function, items))
+
+
 def mkdir_p(path):
     '''
     Emulates the behaviour of `mkdir -p` in shell (makes all the directories
@@ -43,6 +63,41 @@ def mkdir_p(path):
         pass
 
 
+@contextlib.contextmanager
+def atomic_write(path, encoding='utf-8', binary=False):
+    '''
+    Opens a temporary file next to path for writing (in binary mode if binary
+    is True). When the block ends, the file is synced to disk and renamed to
+    path, so that path always contains either its old content or its new
+    content. Permissions of path are kept.
+    '''
+    dirname, basename = os.path.split(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + basename + '.', dir=dirname)
+    try:
+        try:
+            mode = os.stat(path).st_mode & 0o7777
+        except OSError:
+            umask = os.umask(0)
+            os.umask(umask)
+            mode = 0o666 & ~umask
+        os.chmod(tmp_path, mode)
+        if binary:
+            f = open(fd, 'wb')
+        else:
+            f = open(fd, 'w', encoding=encoding, newline='')
+        with f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
 def empty_directory(directory):
     for root, dirs, files in os.walk(directory, topdown=False):
         for f in files:
@@ -59,6 +114,32 @@ def move_content(src, dst):
             dirs.pop()
 
 
+def remove_file(root, relpath):
+    '''
+    Removes the file relpath of root if it exists, then its parent directories
+    left empty, up to root.
+    '''
+    try:
+        os.unlink(os.path.join(root, relpath))
+    except FileNotFoundError:
+        pass
+    dirname = os.path.dirname(relpath)
+    while dirname:
+        try:
+            os.rmdir(os.path.join(root, dirname))
+        except OSError:
+            break
+        dirname = os.path.dirname(dirname)
+
+
+def link_or_copy(src, dst):
+    '''Hard links src to dst, or copies it if it can't be linked.'''
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
 def copy_content(src, dst):
     tmpdst = join(dst, '.tmpcopy')
     shutil.copytree(src, tmpdst)
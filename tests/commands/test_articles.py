@@ -1,12 +1,25 @@
+import argparse
+import datetime
+import os
+import shutil
+import types
+from unittest import mock
+
 import pytest
 
+import lpbm.models.articles as articles_model
 from lpbm.lib.deprecated_command import DEPRECATED_MESSAGE
+from lpbm.lib.file_index import FileIndex, file_stamp
+from lpbm.models.articles import Article
+from lpbm.modules.articles import Articles
 
 
 @pytest.mark.parametrize('commands', [
     ['--new'],
     ['--list'],
     ['--publish', '--id', '0'],
+    ['-i', '0', '-p'],
+    ['-p', '-i', '0'],
     ['--edit', '--id', '0'],
     ['--edit-content', '--id', '0'],
 ])
@@ -14,3 +27,182 @@ def test_commands_are_deprecated(command_caller, commands):
     with pytest.raises(SystemExit) as exc:
         command_caller(['articles'] + commands)
     assert str(exc.value) == DEPRECATED_MESSAGE
+
+
+@pytest.mark.parametrize('jobs', [1, 4])
+def test_articles_are_loaded_with_jobs(blog_path, jobs):
+    articles = Articles()
+    articles.module_load({}, argparse.Namespace(exec_path=blog_path('test-blog-1'), jobs=jobs))
+
+    assert sorted(articles._objects) == [0, 1]
+    assert [a.title for a in sorted(articles.all_objects)] == [
+        'Some Cool Post',
+        'Second Post Best Post',
+    ]
+
+
+def test_articles_index_is_used_and_updated(blog_path, tmpdir):
+    root = str(tmpdir.join('blog'))
+    shutil.copytree(blog_path('test-blog-1'), root)
+
+    def load():
+        articles = Articles()
+        articles.module_load({}, argparse.Namespace(exec_path=root, jobs=1, cache=True))
+        return articles
+
+    load()
+    assert os.path.exists(os.path.join(root, '.lpbm-cache', 'articles.idx'))
+
+    # Articles not modified are not read again, content stays readable.
+    with mock.patch.object(Article, '_read_markdown') as read_markdown:
+        articles = load()
+    assert not read_markdown.called
+    assert articles[0].title == 'Some Cool Post'
+    assert articles[0].published
+    assert articles[0].content == '\nThis is some cool first post for my blog!\n'
+
+    # Modified articles are read again, removed ones are pruned.
+    with open(os.path.join(root, 'articles', 'some-cool-post.markdown'), 'a') as f:
+        f.write('More content.\n')
+    os.unlink(os.path.join(root, 'articles', 'second-post-best-post.markdown'))
+    articles = load()
+    assert articles[0].content.endswith('More content.\n')
+    assert sorted(articles._objects) == [0]
+
+
+def test_articles_index_keeps_configuration_as_read(blog_path, tmpdir):
+    root = str(tmpdir.join('blog'))
+    shutil.copytree(blog_path('test-blog-1'), root)
+    cfg = os.path.join(root, 'articles', 'some-cool-post.cfg')
+    with open(cfg) as f:
+        lines = [line for line in f if not line.startswith('date')]
+    with open(cfg, 'w') as f:
+        f.writelines(lines)
+
+    articles = Articles()
+    articles.module_load({}, argparse.Namespace(exec_path=root, jobs=1, cache=True))
+    assert articles[0].date.year > 2019
+
+    # Date set to articles without one is not kept in the index, it is set
+    # again when articles are built from it.
+    index = FileIndex(os.path.join(root, '.lpbm-cache', 'articles.idx'))
+    stamp = file_stamp(os.path.join(root, 'articles', 'some-cool-post.markdown'), cfg)
+    assert 'date' not in index.get('some-cool-post.markdown', stamp)['config']['general']
+    # Compact mode doesn't use the snapshot taken without it.
+    with mock.patch.object(Article, '_read_markdown') as read_markdown:
+        articles = Articles()
+        articles.module_load({}, argparse.Namespace(exec_path=root, jobs=1, cache=True,
+                                                    compact=True))
+    assert not read_markdown.called
+    assert articles[0].date.year > 2019
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_snapshot_does_not_keep_default_date(blog_path, tmpdir, monkeypatch, compact):
+    root = str(tmpdir.join('blog'))
+    shutil.copytree(blog_path('test-blog-1'), root)
+    cfg = os.path.join(root, 'articles', 'some-cool-post.cfg')
+    with open(cfg) as f:
+        lines = [line for line in f if not line.startswith('date')]
+    with open(cfg, 'w') as f:
+        f.writelines(lines)
+
+    dates = []
+    for now in [datetime.datetime(2020, 1, 1), datetime.datetime(2021, 1, 1)]:
+        clock = types.SimpleNamespace(
+            now=lambda: now, strptime=datetime.datetime.strptime,
+            fromtimestamp=datetime.datetime.fromtimestamp)
+        monkeypatch.setattr(articles_model, 'datetime', types.SimpleNamespace(datetime=clock))
+        articles = Articles()
+        args = argparse.Namespace(exec_path=root, jobs=1, cache=True, compact=compact)
+        with mock.patch.object(Articles, 'load', wraps=articles.load) as load_fn:
+            articles.module_load({}, args)
+        dates.append((articles[0].date, load_fn.called))
+        assert articles.lookup(date=now.date()) == (articles[0],)
+    assert dates == [(datetime.datetime(2020, 1, 1), True), (datetime.datetime(2021, 1, 1), False)]
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_articles_are_restored_from_snapshot(blog_path, tmpdir, compact):
+    root = str(tmpdir.join('blog'))
+    shutil.copytree(blog_path('test-blog-1'), root)
+    args = argparse.Namespace(exec_path=root, jobs=1, cache=True, compact=compact)
+
+    def load():
+        articles = Articles()
+        articles.module_load({}, args)
+        return articles
+
+    expected = load()
+    assert os.path.exists(os.path.join(root, '.lpbm-cache', 'articles.snapshot'))
+
+    # Nothing is read when sources were not modified.
+    with mock.patch.object(Articles, 'load') as load_fn:
+        articles = load()
+    assert not load_fn.called
+    assert [a.title for a in sorted(articles.all_objects)] == \
+        [a.title for a in sorted(expected.all_objects)]
+    assert [a.id for a in articles.lookup(published=True)] == \
+        [a.id for a in expected.lookup(published=True)]
+    assert articles[0].content == '\nThis is some cool first post for my blog!\n'
+    if not compact:
+        assert articles[0].mod is articles
+
+    # Modified sources are loaded again.
+    with open(os.path.join(root, 'articles', 'some-cool-post.cfg'), 'a') as f:
+        f.write('\n')
+    with mock.patch.object(Articles, 'load') as load_fn:
+        load()
+    assert load_fn.called
+
+
+def test_articles_secondary_indexes(blog_path):
+    articles = Articles()
+    args = argparse.Namespace(exec_path=blog_path('test-blog-1'), with_deleted=False)
+    articles.module_load({}, args)
+
+    def ids(objects):
+        return sorted(obj.id for obj in objects)
+
+    assert ids(articles.lookup(author=0)) == [0, 1]
+    assert ids(articles.lookup(author=1, published=False)) == [1]
+    assert ids(articles.lookup(category=2, published=False)) == []
+    assert ids(articles.lookup(date=datetime.date(2019, 6, 9))) == [0]
+
+    articles[1].delete()
+    assert ids(articles.objects) == [0]
+    assert ids(articles.lookup(author=0)) == [0]
+    assert ids(articles.lookup(published=True)) == [0]
+
+    args.with_deleted = True
+    assert ids(articles.objects) == [0, 1]
+    assert ids(articles.lookup(author=0)) == [0, 1]
+
+
+def test_secondary_indexes_follow_field_writes(blog_path):
+    articles = Articles()
+    articles.module_load({}, argparse.Namespace(exec_path=blog_path('test-blog-1'),
+                                                with_deleted=False))
+
+    def ids(objects):
+        return sorted(obj.id for obj in objects)
+
+    articles[1].date = datetime.datetime(2020, 1, 2, 3, 4)
+    assert ids(articles.lookup(date=datetime.date(2020, 1, 2))) == [1]
+    assert ids(articles.lookup(date=datetime.date(2019, 6, 16))) == []
+
+    articles[1].published = True
+    assert ids(articles.lookup(published=True)) == [0, 1]
+    articles[0].published = False
+    assert ids(articles.lookup(published=False)) == [0]
+
+    articles[0].deleted = True
+    assert ids(articles.lookup(published=False)) == []
+    assert ids(articles.objects) == [1]
+    articles[0].deleted = False
+    assert ids(articles.lookup(published=False)) == [0]
+
+    articles[1].authors = '1'
+    assert ids(articles.lookup(author=0)) == [0]
+    articles[0].categories = '2'
+    assert ids(articles.lookup(category=2)) == [0]
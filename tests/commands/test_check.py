@@ -0,0 +1,22 @@
+import pytest
+
+
+def test_valid_blog_has_no_problem(command_caller, capsys):
+    command_caller(['check'])
+    assert capsys.readouterr().out.strip().endswith('No problem found.')
+
+
+def test_all_problems_are_reported(command_caller, capsys):
+    with pytest.raises(SystemExit) as exc:
+        command_caller(['check'], blog='test-blog-broken')
+    assert str(exc.value) == '7 problem(s) found.'
+
+    assert sorted(capsys.readouterr().out.strip().splitlines()[-7:]) == [
+        'article articles/first.markdown references unknown author 5.',
+        'article articles/second.markdown references deleted author 2.',
+        'article articles/second.markdown references unknown category 9.',
+        'article id 0 is shared by: articles/first.markdown, articles/second.markdown.',
+        'author id 0 is shared by: alex, aiden.',
+        'categories form a cycle: Loop A > Loop B > Loop A.',
+        'category Orphan references unknown parent 7.',
+    ]
@@ -1,8 +1,10 @@
 import os
+import shutil
 
 import pytest
 
 import lpbm.modules.migrate as mod
+from lpbm.main import main
 
 
 def _check_file_exists(root, filename):
@@ -59,12 +61,197 @@ def _check_test_blog_1(root):
     _check_file_exists(root, 'medias/data/main.c')
 
 
+@pytest.mark.parametrize('options', [
+    [],
+    ['--compact'],
+    ['--jobs', '4'],
+])
 @pytest.mark.parametrize(('blog_name', 'check_function'), [
     ('test-blog-1', _check_test_blog_1),
 ])
-def test_full_migration(command_caller, monkeypatch, test_result_tempdir, blog_name, check_function):
+def test_full_migration(command_caller, monkeypatch, test_result_tempdir, blog_name,
+                        check_function, options):
     monkeypatch.setattr(mod.ltools, 'ask_sure', lambda *a, **kw: True)
-    command_caller(['migrate'], blog=blog_name)
+    command_caller(options + ['migrate'], blog=blog_name)
 
     _check_mandatory_files(test_result_tempdir)
     check_function(test_result_tempdir)
+
+
+def _read_tree(root):
+    res = dict()
+    for subroot, _, files in os.walk(root):
+        for filename in files:
+            path = os.path.join(subroot, filename)
+            with open(path, 'rb') as f:
+                res[os.path.relpath(path, root)] = f.read()
+    return res
+
+
+def test_migration_with_jobs_is_identical(blog_path, tmpdir):
+    trees = []
+    for jobs in ['1', '4']:
+        output = tmpdir.mkdir('output-' + jobs)
+        main(['--exec-path', blog_path('test-blog-1'), '--jobs', jobs,
+              'migrate', '--noconfirm', '--output', str(output)])
+        trees.append(_read_tree(str(output)))
+
+    # RSS feed contains its build date.
+    for tree in trees:
+        del tree['rssfeed.xml']
+    assert trees[0] == trees[1]
+
+
+def test_migration_is_incremental(blog_path, tmpdir):
+    root, output = str(tmpdir.join('blog')), tmpdir.mkdir('output')
+    shutil.copytree(blog_path('test-blog-1'), root)
+
+    def migrate():
+        main(['--exec-path', root, 'migrate', '--noconfirm', '--output', str(output),
+              '--output-strategy', 'sync'])
+        return _read_tree(str(output))
+
+    def inode(filename):
+        return output.join(filename).stat().ino
+
+    post = '_posts/2019-06-09-some-cool-post.md'
+    draft = '_drafts/2019-06-16-second-post-best-post.md'
+    migrate()
+    assert output.join('.lpbm-manifest.json').check()
+    inodes = dict((filename, inode(filename)) for filename in [post, draft, '_authors/alex.md'])
+    output.join('notes.txt').write('not generated by lpbm')
+
+    # Only the modified article is written again.
+    with open(os.path.join(root, 'articles', 'some-cool-post.markdown'), 'a') as f:
+        f.write('More content.\n')
+    tree = migrate()
+    assert b'More content.' in tree[post]
+    assert inode(post) != inodes[post]
+    assert inode(draft) == inodes[draft]
+    assert inode('_authors/alex.md') == inodes['_authors/alex.md']
+
+    # Outputs of removed articles are removed, other files are kept.
+    for ext in ['.markdown', '.cfg']:
+        os.unlink(os.path.join(root, 'articles', 'second-post-best-post' + ext))
+    tree = migrate()
+    assert draft not in tree and not output.join('_drafts').check()
+    assert tree['notes.txt'] == b'not generated by lpbm'
+
+
+def test_migration_with_swap_strategy(blog_path, tmpdir):
+    output = tmpdir.join('output')
+    output.mksymlinkto(tmpdir.mkdir('empty'))
+    releases = tmpdir.join('.lpbm-releases', 'output')
+
+    def migrate():
+        main(['--exec-path', blog_path('test-blog-1'), 'migrate', '--noconfirm',
+              '--output', str(output), '--output-strategy', 'swap'])
+        return output.readlink()
+
+    post = '_posts/2019-06-09-some-cool-post.md'
+    first = migrate()
+    inode = output.join(post).stat().ino
+
+    # Unchanged files are shared with the previous release, which is kept.
+    second = migrate()
+    assert second != first and output.join(post).stat().ino == inode
+    assert sorted(str(path) for path in releases.listdir()) == sorted([first, second])
+    _check_test_blog_1(str(output))
+
+    third = migrate()
+    assert sorted(str(path) for path in releases.listdir()) == sorted([second, third])
+
+
+def test_swap_strategy_keeps_releases_of_other_outputs(blog_path, tmpdir):
+    # Name of an output is a prefix of the other one.
+    outputs = [tmpdir.join('site'), tmpdir.join('site-staging')]
+    for output in outputs:
+        output.mksymlinkto(tmpdir.mkdir('empty-' + output.basename))
+
+    def migrate(output):
+        main(['--exec-path', blog_path('test-blog-1'), 'migrate', '--noconfirm',
+              '--output', str(output), '--output-strategy', 'swap'])
+
+    for output in outputs + outputs + outputs:
+        migrate(output)
+    for output in outputs:
+        _check_test_blog_1(str(output))
+        assert len(tmpdir.join('.lpbm-releases', output.basename).listdir()) == 2
+
+
+def test_swap_strategy_needs_a_symbolic_link(blog_path, tmpdir):
+    output = tmpdir.mkdir('output')
+    output.join('index.html').write('')
+    with pytest.raises(SystemExit) as exc:
+        main(['--exec-path', blog_path('test-blog-1'), 'migrate', '--noconfirm',
+              '--output', str(output), '--output-strategy', 'swap'])
+    assert 'must be a symbolic link' in str(exc.value)
+
+
+def test_sync_strategy_without_manifest(blog_path, tmpdir):
+    output = tmpdir.mkdir('output')
+    main(['--exec-path', blog_path('test-blog-1'), 'migrate', '--noconfirm',
+          '--output', str(output), '--output-strategy', 'replace'])
+    inode = output.join('_authors', 'alex.md').stat().ino
+    output.join('.lpbm-manifest.json').remove()
+    output.join('unknown.txt').write('')
+
+    # Identical files are kept, others are removed.
+    main(['--exec-path', blog_path('test-blog-1'), 'migrate', '--noconfirm',
+          '--output', str(output), '--output-strategy', 'sync'])
+    assert output.join('_authors', 'alex.md').stat().ino == inode
+    assert not output.join('unknown.txt').check()
+    _check_test_blog_1(str(output))
+
+
+def test_unchanged_medias_are_not_copied(blog_path, tmpdir, capsys):
+    output = tmpdir.mkdir('output')
+    for _ in range(2):
+        main(['--exec-path', blog_path('test-blog-1'), 'migrate', '--noconfirm',
+              '--output', str(output), '--output-strategy', 'sync'])
+    out = [line for line in capsys.readouterr().out.splitlines() if line.startswith('Medias:')]
+    assert out[1].startswith('Medias: 0 B copied') and '0 B unchanged' not in out[1]
+
+    source = os.path.join(blog_path('test-blog-1'), 'medias', 'data', 'main.c')
+    with open(source, 'rb') as f:
+        assert output.join('medias', 'data', 'main.c').read_binary() == f.read()
+
+
+def test_confirmation_depends_on_strategy(blog_path, tmpdir, monkeypatch):
+    prompts = []
+    monkeypatch.setattr(mod.ltools, 'ask_sure', lambda prompt: prompts.append(prompt) or True)
+    output = tmpdir.mkdir('output')
+    for strategy in ['sync', 'sync', 'replace']:
+        main(['--exec-path', blog_path('test-blog-1'), 'migrate', '--output', str(output),
+              '--output-strategy', strategy])
+    assert prompts[0].endswith('This action will remove all its contents!')
+    assert prompts[1].endswith('Files generated by the previous migration will be replaced '
+                               'or removed.')
+    assert prompts[2].endswith('This action will remove all its contents!')
+
+
+def test_damaged_medias_are_repaired(blog_path, tmpdir):
+    output = tmpdir.mkdir('output')
+    media = output.join('medias', 'data', 'main.c')
+    source = os.path.join(blog_path('test-blog-1'), 'medias', 'data', 'main.c')
+    with open(source, 'rb') as f:
+        content = f.read()
+    for _ in range(2):
+        main(['--exec-path', blog_path('test-blog-1'), 'migrate', '--noconfirm',
+              '--output', str(output), '--output-strategy', 'sync'])
+        assert media.read_binary() == content
+        # Replaced, not to modify the source it may be linked to.
+        media.remove()
+        media.write_binary(content[:10])
+
+
+def test_output_is_replaced_by_default(blog_path, tmpdir):
+    output = tmpdir.mkdir('output')
+    for _ in range(2):
+        main(['--exec-path', blog_path('test-blog-1'), 'migrate', '--noconfirm',
+              '--output', str(output)])
+        output.join('notes.txt').write('not generated by lpbm')
+    main(['--exec-path', blog_path('test-blog-1'), 'migrate', '--noconfirm',
+          '--output', str(output)])
+    assert not output.join('notes.txt').check()
+    _check_test_blog_1(str(output))
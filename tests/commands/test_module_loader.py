@@ -0,0 +1,89 @@
+import argparse
+import subprocess
+import sys
+import threading
+
+import pytest
+
+import lpbm.main
+import lpbm.module_loader as mod
+from lpbm.main import main
+
+
+def test_commands_table_is_complete(monkeypatch):
+    expected = dict(mod.COMMANDS)
+    monkeypatch.setattr(mod, 'COMMANDS', dict())
+
+    found = dict((cls().name(), (cls.__module__, cls.__name__, cls().abstract()))
+                 for cls in mod.discover_modules())
+    assert found == expected
+
+
+def test_only_chosen_command_is_loaded():
+    modules = mod.LazyModules()
+    mod.load_modules(modules, argparse.ArgumentParser().add_subparsers(), 'articles',
+                     discover=False)
+    assert list(modules) == ['articles']
+
+    # Other modules are loaded when they are needed.
+    assert modules['authors'].name() == 'authors'
+    assert sorted(modules) == ['articles', 'authors']
+    with pytest.raises(KeyError):
+        modules['unknown']
+
+
+@pytest.mark.parametrize(('args', 'command'), [
+    (['articles', '-i', '1', '-p'], 'articles'),
+    (['-p', 'blog', 'articles', '-p', '-i', '1'], 'articles'),
+    (['--exec-path', 'articles', '-c', 'authors'], 'authors'),
+    (['-j', '2', '-p'], None),
+    (['--help'], None),
+])
+def test_command_is_found_after_global_options(args, command):
+    assert lpbm.main._find_command(args) == command
+
+
+def test_help_lists_all_commands(capsys):
+    with pytest.raises(SystemExit):
+        main(['--help'])
+    out = ' '.join(capsys.readouterr().out.split())
+    for name, (_, _, abstract) in mod.COMMANDS.items():
+        assert name in out and abstract in out
+
+
+def test_heavy_modules_are_not_imported_by_other_commands(blog_path):
+    code = '\n'.join([
+        'import sys',
+        'from lpbm.main import main',
+        'main(["--exec-path", sys.argv[1], "authors"])',
+        'print(sorted(m for m in ["jinja2", "PyRSS2Gen", "pdb", "lpbm.modules.migrate", "sqlite3",'
+        ' "lpbm.lib.snapshot"]'
+        ' if m in sys.modules))',
+    ])
+    out = subprocess.check_output([sys.executable, '-c', code, blog_path('test-blog-1')])
+    assert out.decode().strip().splitlines()[-1] == '[]'
+
+
+def test_needed_modules_are_loaded_concurrently(blog_path, monkeypatch):
+    from lpbm.modules.authors import Authors
+    from lpbm.modules.categories import Categories
+
+    # Authors and categories wait for each other while loading, this only
+    # works if they are loaded at the same time.
+    barrier = threading.Barrier(2, timeout=5)
+    for cls in [Authors, Categories]:
+        def load(self, modules, args, _load=cls.load):
+            barrier.wait()
+            _load(self, modules, args)
+        monkeypatch.setattr(cls, 'load', load)
+
+    modules = mod.LazyModules()
+    mod.load_modules(modules, argparse.ArgumentParser().add_subparsers(), 'check',
+                     discover=False)
+    args = argparse.Namespace(exec_path=blog_path('test-blog-1'), debug=False)
+    modules['check'].module_process(modules, args)
+
+    timings = modules['check'].load_timings
+    assert sorted(timings) == ['articles', 'authors', 'categories', 'check', 'config']
+    config_end = sum(timings['config'])
+    assert all(timings[name][0] >= config_end for name in ['articles', 'authors', 'categories'])
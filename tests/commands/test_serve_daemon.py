@@ -0,0 +1,94 @@
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import pytest
+
+import lpbm.lib.daemon as daemon
+from lpbm.main import main
+from lpbm.modules.serve_daemon import ServeDaemon
+
+_MAIN = 'import sys; from lpbm.main import main; main(sys.argv[1:])'
+
+
+@pytest.fixture
+def served_blog(blog_path, tmpdir):
+    root = str(tmpdir.join('blog'))
+    shutil.copytree(blog_path('test-blog-broken'), root)
+    proc = subprocess.Popen([sys.executable, '-c', _MAIN, '-p', root, 'serve-daemon'],
+                            stdout=subprocess.DEVNULL)
+    try:
+        path = daemon.socket_path(root)
+        for _ in range(100):
+            try:
+                daemon.request(path, {})
+                break
+            except OSError:
+                time.sleep(0.1)
+        else:
+            pytest.fail('daemon did not start')
+        yield root
+    finally:
+        subprocess.call([sys.executable, '-c', _MAIN, '-p', root, 'serve-daemon', '--stop'])
+        proc.wait(timeout=10)
+
+
+def _check(root):
+    with pytest.raises(SystemExit) as exc:
+        main(['--client', '-p', root, 'check'])
+    return exc.value.code
+
+
+def test_commands_are_run_by_daemon(served_blog, capsys):
+    assert _check(served_blog) == 1
+    out, err = capsys.readouterr()
+    assert '7 problem(s) found.' in err
+    assert 'category Orphan references unknown parent 7.' in out
+
+    # The blog is loaded again once modified.
+    with open(os.path.join(served_blog, 'categories.cfg'), 'a') as f:
+        f.write('\n[Lost]\nid = 5\nparent = 8\nslug = lost\n')
+    assert _check(served_blog) == 1
+    out, err = capsys.readouterr()
+    assert '8 problem(s) found.' in err
+    assert 'category Lost references unknown parent 8.' in out
+
+
+def test_daemon_refuses_to_serve_itself(served_blog, capsys):
+    with pytest.raises(SystemExit) as exc:
+        main(['--client', '-p', served_blog, 'serve-daemon'])
+    assert exc.value.code == 1
+    assert 'can\'t be run through the daemon' in capsys.readouterr().err
+
+
+def test_client_runs_locally_without_daemon(blog_path, capsys):
+    main(['--client', '-p', blog_path('test-blog-1'), 'check'])
+    assert capsys.readouterr().out.strip().endswith('No problem found.')
+
+
+def test_daemon_only_watches_sources(blog_path, tmpdir):
+    root = str(tmpdir.join('blog'))
+    shutil.copytree(blog_path('test-blog-1'), root)
+    server = ServeDaemon()
+    server.module_init(argparse.ArgumentParser().add_subparsers())
+    server.root = root
+
+    assert server.run(['-p', root, 'check'], root)['status'] == 0
+    articles = server.cache['articles']
+
+    # Medias and generated files don't make the blog load again.
+    os.makedirs(os.path.join(root, 'result-jekyll'))
+    with open(os.path.join(root, 'result-jekyll', 'index.html'), 'w') as f:
+        f.write('')
+    with open(os.path.join(root, 'medias', 'new.txt'), 'w') as f:
+        f.write('')
+    assert server.run(['-p', root, 'check'], root)['status'] == 0
+    assert server.cache['articles'] is articles
+
+    with open(os.path.join(root, 'articles', 'some-cool-post.cfg'), 'a') as f:
+        f.write('\n')
+    assert server.run(['-p', root, 'check'], root)['status'] == 0
+    assert server.cache['articles'] is not articles
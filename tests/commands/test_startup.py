@@ -0,0 +1,12 @@
+import os
+
+import pytest
+
+startup = pytest.importorskip('benchmarks.startup')
+
+
+@pytest.mark.skipif(not os.environ.get('LPBM_BENCHMARKS'),
+                    reason='startup benchmark is only run with LPBM_BENCHMARKS set.')
+def test_startup_budgets():
+    failures = startup.check(startup.load_budgets(), startup.measure(runs=5))
+    assert not failures, 'Startup budgets exceeded:\n  ' + '\n  '.join(failures)
@@ -0,0 +1,81 @@
+import configparser
+import io
+import os
+import shutil
+
+import pytest
+
+import lpbm.lib.sqlitestore as sqlitestore
+import lpbm.models.configmodel as cm_module
+import lpbm.modules.migrate as migrate_mod
+from lpbm.main import main
+
+
+@pytest.fixture
+def blog(blog_path, tmpdir):
+    root = str(tmpdir.join('blog'))
+    shutil.copytree(blog_path('test-blog-1'), root, symlinks=True)
+    try:
+        yield root
+    finally:
+        cm_module.use_store(None)
+
+
+def _config_files(root):
+    res = []
+    for subroot, _, files in os.walk(root):
+        res.extend(os.path.relpath(os.path.join(subroot, f), root)
+                   for f in files if f.endswith('.cfg') and f != 'lpbm.cfg')
+    return sorted(res)
+
+
+def _written_by_configparser(path):
+    config = configparser.ConfigParser(interpolation=None)
+    config.read(path, encoding='utf-8')
+    f = io.StringIO()
+    config.write(f)
+    return f.getvalue()
+
+
+def test_import_export_is_lossless(blog, tmpdir):
+    output = str(tmpdir.join('output'))
+    main(['--exec-path', blog, 'store', 'import'])
+    main(['--exec-path', blog, 'store', 'export', '-o', output])
+
+    filenames = _config_files(blog)
+    assert filenames and _config_files(output) == filenames
+    for filename in filenames:
+        with open(os.path.join(output, filename), encoding='utf-8') as f:
+            assert f.read() == _written_by_configparser(os.path.join(blog, filename))
+
+
+def test_migrate_from_store(blog, tmpdir, monkeypatch):
+    monkeypatch.setattr(migrate_mod.ltools, 'ask_sure', lambda *a, **kw: True)
+    main(['--exec-path', blog, 'store', 'import'])
+    for filename in _config_files(blog):
+        os.unlink(os.path.join(blog, filename))
+    with open(os.path.join(blog, 'lpbm.cfg'), 'a') as f:
+        f.write('\n[store]\nbackend = sqlite\n')
+
+    output = tmpdir.join('output')
+    output.mkdir()
+    main(['--exec-path', blog, 'migrate', '-o', str(output)])
+
+    post = output.join('_posts', '2019-06-09-some-cool-post.md').read()
+    assert 'authors: [alex,]' in post
+    assert 'categories: ["Main Category 1 > Sub Category 2"]' in post
+    assert output.join('_drafts', '2019-06-16-second-post-best-post.md').check()
+    assert _config_files(blog) == []
+
+
+def test_store_is_closed_after_command(blog, monkeypatch):
+    main(['--exec-path', blog, 'store', 'import'])
+    with open(os.path.join(blog, 'lpbm.cfg'), 'a') as f:
+        f.write('\n[store]\nbackend = sqlite\n')
+
+    closed = []
+    close = sqlitestore.Store.close
+    monkeypatch.setattr(sqlitestore.Store, 'close',
+                        lambda store: closed.append(store) or close(store))
+    main(['--exec-path', blog, 'check'])
+    assert len(closed) == 1 and cm_module.active_store() is None
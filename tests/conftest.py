@@ -9,6 +9,15 @@ from lpbm.main import main
 _ROOT = os.path.abspath(os.path.dirname(__file__))
 
 
+def _blog_path(blog):
+    return os.path.join(_ROOT, 'data', blog)
+
+
+@pytest.fixture
+def blog_path():
+    return _blog_path
+
+
 @pytest.yield_fixture
 def test_tempdir():
     try:
@@ -34,7 +43,7 @@ def command_caller(test_result_tempdir):
         return os.path.join(root, 'result-jekyll')
 
     def command(args, blog='test-blog-1'):
-        root = os.path.join(_ROOT, 'data', blog)
+        root = _blog_path(blog)
         paths.add(root)
 
         os.symlink(test_result_tempdir, _link_path(root))
@@ -0,0 +1,112 @@
+import configparser
+import io
+
+import pytest
+
+import lpbm.lib.fastini as mod
+import lpbm.models.configmodel as cm_module
+
+_SUPPORTED = [
+    '',
+    '[general]\n',
+    '[general]\nid = 0\ndate = 2019-06-09T18:00:00\npublished = yes\n',
+    '[general]\nauthors = 0, 1\ncategories = 1\n\n\n[other]\nkey=value\n',
+    '# comment\n; other comment\n[general]\n# inside\nId = 3\nEmpty =\nColon: value\n',
+    '[general]\nurl = http://a.b/?c=d:e\npercent = 100%%\nref = %(id)s-x\nid = 3\n',
+    '[Main Category 1]\nid = 0\nslug = main\n\n[Sub [1]]\nid = 1\nparent = 0\n',
+    '[general]\r\nid = 4\r\npublished = off\r\n',
+    '[général]\ntitle = Étape 1\n',
+]
+
+_UNSUPPORTED = [
+    '[general]\nlong = first\n  second line\n',
+    '[general]\n  id = 3\n',
+    '[DEFAULT]\nid = 3\n[general]\n',
+    '[general]\nid = 3\n[general]\nid = 4\n',
+    '[general]\n[a] = b\n',
+    'id = 3\n',
+    '[general]\nno delimiter\n',
+]
+
+
+def _read(cls, tmpdir, content):
+    path = tmpdir.join('test.cfg')
+    path.write_binary(content.encode('utf-8'))
+    config = cls()
+    config.read(str(path), encoding='utf-8')
+    return config
+
+
+def _write(config):
+    f = io.StringIO()
+    config.write(f)
+    return f.getvalue()
+
+
+def _state(config):
+    return [
+        (section, config.items(section, raw=True), config.items(section))
+        for section in config.sections()
+    ]
+
+
+@pytest.mark.parametrize('content', _SUPPORTED)
+def test_files_are_read_like_configparser(tmpdir, content):
+    fast = _read(mod.FastConfigParser, tmpdir, content)
+    ref = _read(configparser.ConfigParser, tmpdir, content)
+
+    assert _state(fast) == _state(ref)
+    assert _write(fast) == _write(ref)
+
+
+@pytest.mark.parametrize('content', _SUPPORTED)
+def test_modified_files_are_written_like_configparser(tmpdir, content):
+    fast = _read(mod.FastConfigParser, tmpdir, content)
+    ref = _read(configparser.ConfigParser, tmpdir, content)
+
+    for config in [fast, ref]:
+        if not config.has_section('general'):
+            config.add_section('general')
+        config.set('general', 'Published', 'no')
+        config.set('general', 'new', 'multi\nline')
+        config.remove_option('general', 'url')
+        config.add_section('added')
+        config.set('added', 'key', '50%%')
+        config.remove_section('other')
+
+    assert _state(fast) == _state(ref)
+    assert _write(fast) == _write(ref)
+
+
+@pytest.mark.parametrize('getter,value', [
+    ('getint', 3),
+    ('getboolean', True),
+    ('getfloat', 1.5),
+])
+def test_typed_getters(tmpdir, getter, value):
+    content = '[general]\ngetint = 3\ngetboolean = on\ngetfloat = 1.5\nbad = foo\n'
+    fast = _read(mod.FastConfigParser, tmpdir, content)
+
+    assert getattr(fast, getter)('general', getter) == value
+    assert getattr(fast, getter)('general', 'missing', fallback=None) is None
+    assert getattr(fast, getter)('missing', getter, fallback=None) is None
+    with pytest.raises(ValueError):
+        getattr(fast, getter)('general', 'bad')
+    with pytest.raises(configparser.NoOptionError):
+        getattr(fast, getter)('general', 'missing')
+
+
+@pytest.mark.parametrize('content', _UNSUPPORTED)
+def test_unsupported_syntax_falls_back_to_configparser(tmpdir, content):
+    with pytest.raises(mod.UnsupportedSyntaxError):
+        _read(mod.FastConfigParser, tmpdir, content)
+
+    path = tmpdir.join('test.cfg')
+    try:
+        cm = cm_module.ConfigModel(str(path), backend='fast')
+    except configparser.Error:
+        with pytest.raises(configparser.Error):
+            _read(configparser.ConfigParser, tmpdir, content)
+    else:
+        assert isinstance(cm.config, configparser.ConfigParser)
+        assert _state(cm.config) == _state(_read(configparser.ConfigParser, tmpdir, content))
@@ -0,0 +1,33 @@
+import lpbm.lib.file_index as mod
+
+
+def test_entries_are_validated_with_stamp(tmpdir):
+    source = tmpdir.join('source.txt')
+    source.write('foo')
+
+    index = mod.FileIndex(str(tmpdir.join('cache', 'index.idx')))
+    stamp = mod.file_stamp(str(source))
+    index.set('source.txt', stamp, {'foo': 1})
+    index.save()
+
+    index = mod.FileIndex(str(tmpdir.join('cache', 'index.idx')))
+    assert index.get('source.txt', stamp) == {'foo': 1}
+
+    source.write('foobar')
+    assert index.get('source.txt', mod.file_stamp(str(source))) is None
+
+
+def test_pruned_entries_are_removed(tmpdir):
+    index = mod.FileIndex(str(tmpdir.join('index.idx')))
+    index.set('a', [None], 1)
+    index.set('b', [None], 2)
+    index.prune(['b'])
+
+    assert 'a' not in index
+    assert index.get('b', [None]) == 2
+
+
+def test_invalid_index_is_ignored(tmpdir):
+    tmpdir.join('index.idx').write('not json')
+    index = mod.FileIndex(str(tmpdir.join('index.idx')))
+    assert index.get('a', [None]) is None
@@ -0,0 +1,42 @@
+import os
+
+import lpbm.lib.filesync as mod
+
+
+def test_files_are_linked_when_possible(tmpdir):
+    source = tmpdir.join('source.bin')
+    source.write('data')
+    target = tmpdir.join('out', 'target.bin')
+
+    assert mod.place(str(source), str(target)) == mod.LINKED
+    assert target.stat().ino == source.stat().ino
+    assert mod.same_stamp(str(source), str(target))
+
+
+def test_files_are_copied_otherwise(tmpdir, monkeypatch):
+    def link(src, dst):
+        raise OSError('cross-device link')
+    monkeypatch.setattr(mod.os, 'link', link)
+
+    source = tmpdir.join('source.bin')
+    source.write('data')
+    os.utime(str(source), ns=(1, 1000000000))
+    target = tmpdir.join('target.bin')
+    target.write('old data')
+
+    assert mod.place_all([(str(source), str(target))]) == {mod.LINKED: 0, mod.COPIED: 4}
+    assert target.read() == 'data'
+    assert mod.same_stamp(str(source), str(target))
+    assert sorted(p.basename for p in tmpdir.listdir()) == ['source.bin', 'target.bin']
+
+
+def test_stamps_differ(tmpdir):
+    tmpdir.join('a').write('a')
+    tmpdir.join('b').write('bb')
+    assert not mod.same_stamp(str(tmpdir.join('a')), str(tmpdir.join('b')))
+    assert not mod.same_stamp(str(tmpdir.join('a')), str(tmpdir.join('missing')))
+
+
+def test_format_size():
+    assert mod.format_size(12) == '12 B'
+    assert mod.format_size(3 * 1024 * 1024) == '3.0 MiB'
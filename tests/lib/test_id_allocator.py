@@ -0,0 +1,12 @@
+import lpbm.lib.id_allocator as mod
+
+
+def test_ids_are_allocated_after_highest_id():
+    allocator = mod.IdAllocator()
+    assert allocator.next_id() == 0
+
+    for id in [3, None, 1, 7]:
+        allocator.add(id)
+    assert len(allocator) == 3
+    assert 7 in allocator and 2 not in allocator
+    assert allocator.next_id() == 8
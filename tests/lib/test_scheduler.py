@@ -0,0 +1,49 @@
+import threading
+
+import pytest
+
+import lpbm.lib.scheduler as mod
+
+
+def test_dependencies_are_respected():
+    events, lock = [], threading.Lock()
+
+    def task(name):
+        def run():
+            with lock:
+                events.append(name)
+        return run
+
+    tasks = dict((name, task(name)) for name in 'abcd')
+    timings = mod.run_graph(tasks, {'b': ['a'], 'c': ['a'], 'd': ['b', 'c']})
+
+    assert sorted(timings) == ['a', 'b', 'c', 'd']
+    assert events[0] == 'a' and events[-1] == 'd'
+    for name, (start, duration) in timings.items():
+        assert start >= 0 and duration >= 0
+
+
+def test_independent_tasks_overlap():
+    # Both tasks wait for each other: this only works if they run together.
+    barrier = threading.Barrier(2, timeout=5)
+    mod.run_graph({'a': barrier.wait, 'b': barrier.wait}, {})
+
+
+def test_errors_stop_scheduling():
+    ran = []
+
+    def fail():
+        raise RuntimeError('failed')
+
+    with pytest.raises(RuntimeError):
+        mod.run_graph({'a': fail, 'b': lambda: ran.append('b')}, {'b': ['a']})
+    assert ran == []
+
+
+@pytest.mark.parametrize('dependencies', [
+    {'a': ['b'], 'b': ['a']},
+    {'a': ['unknown']},
+])
+def test_invalid_graphs_are_rejected(dependencies):
+    with pytest.raises(ValueError):
+        mod.run_graph({'a': lambda: None, 'b': lambda: None}, dependencies)
@@ -0,0 +1,26 @@
+import lpbm.lib.snapshot as mod
+
+
+def test_snapshot_is_validated_with_fingerprint(tmpdir):
+    tmpdir.join('source.cfg').write('foo')
+    tmpdir.join('dir', 'a.txt').write('a', ensure=True)
+    filename = str(tmpdir.join('cache', 'test.snapshot'))
+
+    def fingerprint():
+        return mod.fingerprint(str(tmpdir), ['source.cfg', 'dir'])
+
+    mod.save(filename, fingerprint(), {'objects': [1, 2]})
+    assert mod.load(filename, fingerprint()) == {'objects': [1, 2]}
+
+    tmpdir.join('dir', 'b.txt').write('b')
+    assert mod.load(filename, fingerprint()) is None
+
+
+def test_fingerprint_depends_on_extra_values(tmpdir):
+    assert mod.fingerprint(str(tmpdir), [], True) != mod.fingerprint(str(tmpdir), [], False)
+
+
+def test_invalid_snapshot_is_ignored(tmpdir):
+    tmpdir.join('test.snapshot').write('garbage')
+    assert mod.load(str(tmpdir.join('test.snapshot')), 'x') is None
+    assert mod.load(str(tmpdir.join('missing.snapshot')), 'x') is None
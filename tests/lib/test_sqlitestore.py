@@ -0,0 +1,67 @@
+import pytest
+
+import lpbm.lib.sqlitestore as mod
+import lpbm.models.configmodel as cm_module
+
+
+@pytest.fixture
+def store(tmpdir):
+    store = mod.Store(str(tmpdir.join('lpbm.sqlite')), str(tmpdir))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def active_store(store):
+    cm_module.use_store(store)
+    try:
+        yield store
+    finally:
+        cm_module.use_store(None)
+
+
+def test_files_keep_order_of_sections_and_options(store, tmpdir):
+    sections = {'b': {'z': '1', 'a': '2'}, 'a': {}, 'c': {'k': 'multi\nline'}}
+    store.save_file(str(tmpdir.join('articles', 'x.cfg')), sections)
+
+    other = mod.Store(store.path, str(tmpdir))
+    try:
+        assert other.files() == ['articles/x.cfg']
+        assert other.get_file(str(tmpdir.join('articles', 'x.cfg'))) == sections
+        assert list(other.get_file(str(tmpdir.join('articles', 'x.cfg')))['b']) == ['z', 'a']
+    finally:
+        other.close()
+
+
+def test_save_files_can_replace_content(store, tmpdir):
+    store.save_files({str(tmpdir.join('a.cfg')): {'a': {}}, str(tmpdir.join('b.cfg')): {}})
+    store.save_files({str(tmpdir.join('c.cfg')): {'c': {'k': 'v'}}}, replace=True)
+
+    assert store.files() == ['c.cfg']
+    assert not store.exists(str(tmpdir.join('a.cfg')))
+
+
+class _Model(cm_module.Model):
+    name = cm_module.opt('name')
+    published = cm_module.opt_bool('published', default=False)
+
+    def __init__(self, cm):
+        super().__init__(None, None)
+        self.cm = cm
+
+
+def test_descriptors_work_on_store(active_store, tmpdir):
+    filename = str(tmpdir.join('authors.cfg'))
+    cm = cm_module.ConfigModel(filename)
+    assert isinstance(cm.config, mod.StoreConfigParser)
+
+    model = _Model(cm)
+    model.id, model.name, model.published = 3, 'Alex', True
+    model.save()
+    assert not tmpdir.join('authors.cfg').check()
+
+    model = _Model(cm_module.ConfigModel(filename))
+    assert (model.id, model.name, model.published, model.deleted) == (3, 'Alex', True, False)
+    assert active_store.get_file(filename) == {
+        'general': {'id': '3', 'name': 'Alex', 'published': 'yes'},
+    }
@@ -1,4 +1,16 @@
-from lpbm.models.articles import translate_to_jekyll_markdown
+import datetime
+import glob
+import io
+import os
+from unittest import mock
+
+import pytest
+
+from lpbm.models.articles import (
+    Article, CompactArticle, translate_to_jekyll_markdown, write_jekyll_markdown,
+)
+
+_JEKYLL_CORPUS = os.path.join(os.path.dirname(__file__), '..', 'data', 'jekyll-markdown')
 
 
 def test_collapsers_are_just_removed():
@@ -79,3 +91,96 @@ and some final text
 '''
 
     assert translate_to_jekyll_markdown(inp) == out
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_article_content_is_read(tmpdir, lazy):
+    path = tmpdir.join('some-post.markdown')
+    path.write_text('Some Post\n=========\n\nSome content é\n', encoding='utf-8')
+
+    article = Article(None, None, str(path), lazy=lazy)
+    assert article.title == 'Some Post'
+    assert (article._content is None) == lazy
+    assert article.content == '\nSome content é\n'
+
+
+def test_lazy_article_is_saved_with_its_content(tmpdir):
+    path = tmpdir.join('some-post.markdown')
+    path.write_text('Some Post\n=========\n\nSome content.\n', encoding='utf-8')
+
+    article = Article(None, None, str(path), lazy=True)
+    article.save()
+    assert path.read_text(encoding='utf-8') == 'Some Post\n=========\n\nSome content.\n'
+
+
+@pytest.mark.parametrize('source,title,content', [
+    ('', '', ''),
+    ('Title only\n', 'Title only', ''),
+    ('Title\non two lines\n===\ncontent\n', 'Titleon two lines', 'content\n'),
+    ('Title\n===', 'Title', ''),
+    ('==\n\ncontent with\n==\nseparator\n', '', '\ncontent with\n==\nseparator\n'),
+    ('Windows\r\n=======\r\ncontent\r\n', 'Windows\r', 'content\r\n'),
+])
+def test_article_source_is_split(tmpdir, source, title, content):
+    path = tmpdir.join('some-post.markdown')
+    path.write_binary(source.encode('utf-8'))
+
+    for lazy in [False, True]:
+        article = Article(None, None, str(path), lazy=lazy)
+        assert (article.title, article.content) == (title, content)
+
+
+def test_article_sort_key_is_cached_and_invalidated(tmpdir):
+    path = tmpdir.join('some-post.markdown')
+    path.write_text('Some Post\n=========\n', encoding='utf-8')
+    tmpdir.join('some-post.cfg').write('[general]\nid = 3\ndate = 2019-06-09T18:00:00\n')
+
+    article = Article(None, None, str(path))
+    with mock.patch.object(datetime, 'datetime', wraps=datetime.datetime) as dt:
+        assert article.sort_key == (datetime.datetime(2019, 6, 9, 18), 3)
+        assert article.sort_key == (datetime.datetime(2019, 6, 9, 18), 3)
+        assert article.date == datetime.datetime(2019, 6, 9, 18)
+    assert dt.strptime.call_count == 1
+
+    article.date = datetime.datetime(2020, 1, 1)
+    assert article.sort_key == (datetime.datetime(2020, 1, 1), 3)
+    article.id = 7
+    assert article.sort_key == (datetime.datetime(2020, 1, 1), 7)
+
+
+@pytest.mark.parametrize('filename', sorted(
+    os.path.basename(path)[:-len('.markdown')]
+    for path in glob.glob(os.path.join(_JEKYLL_CORPUS, '*.markdown'))
+))
+def test_jekyll_translation_matches_golden_output(filename):
+    with open(os.path.join(_JEKYLL_CORPUS, filename + '.markdown'), 'rb') as f:
+        inp = f.read().decode('utf-8')
+    with open(os.path.join(_JEKYLL_CORPUS, filename + '.md'), 'rb') as f:
+        out = f.read().decode('utf-8')
+
+    assert translate_to_jekyll_markdown(inp) == out
+
+    f = io.StringIO()
+    write_jekyll_markdown(inp, f)
+    assert f.getvalue() == out
+
+
+def test_compact_article_keeps_metadata(tmpdir):
+    path = tmpdir.join('some-post.markdown')
+    path.write_text('Some Post\n=========\n\ncontent\n', encoding='utf-8')
+    tmpdir.join('some-post.cfg').write(
+        '[general]\nid = 3\ndate = 2019-06-09T18:00:00\nauthors = 1, 0\npublished = yes\n'
+    )
+
+    article = Article(None, None, str(path), lazy=True)
+    compact = CompactArticle(article)
+    assert (compact.id, compact.title, compact.published, compact.deleted) == \
+        (3, 'Some Post', True, False)
+    assert compact.authors == (0, 1)
+    assert compact.authors is CompactArticle(article).authors
+    assert compact.jekyll_markdown_filename() == article.jekyll_markdown_filename()
+    assert compact.jekyll_content == article.jekyll_content == '\ncontent\n'
+
+    full = compact.materialize(None, None)
+    assert isinstance(full, Article)
+    assert (full.id, full.title) == (3, 'Some Post')
@@ -0,0 +1,129 @@
+from unittest import mock
+
+import pytest
+
+import lpbm.models.configmodel as mod
+
+
+class _Model(mod.Model):
+    published = mod.opt_bool('published', default=False)
+    count = mod.opt_int('count')
+
+    def __init__(self, filename):
+        super().__init__(None, None)
+        self.cm = mod.ConfigModel(filename)
+
+
+def test_values_are_decoded_once(tmpdir):
+    tmpdir.join('model.cfg').write('[general]\nid = 3\ncount = 12\n')
+    model = _Model(str(tmpdir.join('model.cfg')))
+
+    assert (model.id, model.count) == (3, 12)
+    with mock.patch.object(model.cm, 'config', None):
+        assert (model.id, model.count) == (3, 12)
+
+
+def test_values_are_written_through(tmpdir):
+    tmpdir.join('model.cfg').write('[general]\nid = 3\n')
+    model = _Model(str(tmpdir.join('model.cfg')))
+
+    assert model.published is False
+    assert model.cm.config.get('general', 'published') == 'no'
+
+    model.published, model.count = True, 4
+    assert (model.published, model.count) == (True, 4)
+    assert model.cm.config.get('general', 'published') == 'yes'
+
+    model.count = None
+    assert model.count is None
+    assert not model.cm.config.has_option('general', 'count')
+
+
+def test_values_are_decoded_when_read(tmpdir):
+    tmpdir.join('model.cfg').write('[general]\nid = 3\n')
+    model = _Model(str(tmpdir.join('model.cfg')))
+
+    # Writing a value that can't be decoded only fails when it is read.
+    model.count = 'twelve'
+    assert model.cm.config.get('general', 'count') == 'twelve'
+    with pytest.raises(ValueError):
+        model.count
+    model.count = 12
+    assert model.count == 12
+
+
+def test_unmodified_configuration_is_not_saved(tmpdir):
+    path = tmpdir.join('model.cfg')
+    path.write('[general]\nid = 3\n')
+    model = _Model(str(path))
+
+    # Reading a default value is not a modification.
+    assert model.published is False
+    model.id = 3
+    with mock.patch.object(mod.ConfigModel, '_write') as write:
+        model.save()
+    assert not write.called
+
+    model.id = 4
+    model.save()
+    assert path.read() == '[general]\nid = 4\npublished = no\n\n'
+    assert not model.cm.dirty
+
+
+def test_configuration_is_saved_once_in_batch(tmpdir):
+    path = tmpdir.join('model.cfg')
+    path.write('[general]\nid = 3\n')
+    model = _Model(str(path))
+
+    with mock.patch.object(mod.ConfigModel, '_write', autospec=True) as write:
+        with mod.batch_save():
+            for count in range(10):
+                model.count = count
+                model.save()
+            assert not write.called
+    write.assert_called_once_with(model.cm)
+
+
+def test_atomic_write_keeps_old_content_on_error(tmpdir):
+    path = tmpdir.join('model.cfg')
+    path.write('old content')
+
+    with pytest.raises(RuntimeError):
+        with mod.ltools.atomic_write(str(path)) as f:
+            f.write('new content')
+            raise RuntimeError()
+    assert path.read() == 'old content'
+    assert tmpdir.listdir() == [path]
+
+
+class _SectionModel(mod.Model):
+    count = mod.opt_int('count')
+
+    def __init__(self, cm, name):
+        super().__init__(None, None)
+        self.cm, self.name = cm, name
+
+    @property
+    def section(self):
+        return self.name
+
+
+class _OverridingModel(_Model):
+    @property
+    def count(self):
+        return 42
+
+
+def test_fields_are_bound_to_model_classes(tmpdir):
+    assert _Model.id is not mod.Model.id
+    assert _Model.id.field._fixed_section == 'general'
+    assert _SectionModel.id.field._fixed_section is None
+    assert _OverridingModel.count == vars(_OverridingModel)['count']
+
+    tmpdir.join('model.cfg').write('[a]\nid = 1\ncount = 2\n[b]\nid = 3\n')
+    cm = mod.ConfigModel(str(tmpdir.join('model.cfg')))
+    a, b = _SectionModel(cm, 'a'), _SectionModel(cm, 'b')
+    assert (a.id, a.count, b.id, b.count) == (1, 2, 3, None)
+    b.count = 4
+    assert (a.count, b.count) == (2, 4)
+    assert cm.config.get('b', 'count') == '4'